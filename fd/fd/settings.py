@@ -93,6 +93,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Тестовая база в файле: в общей памяти SQLite параллельные транзакции не ждут
+        # блокировку, а сразу падают, и проверка параллельных броней теряет смысл
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -154,3 +157,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Phone number field settings
 PHONENUMBER_DEFAULT_REGION = 'RU'
+
+# Обслуживание статусов аренд (команда update_rental_statuses)
+# Через сколько суток после даты начала аренды неактивированный резерв автоматически
+# отменяется. Отмена необратима, поэтому срок выбран с запасом на опоздание клиента
+RENTAL_RESERVATION_TTL_DAYS = 3
@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.conf import settings
-from .models import Transport, RentalApplication, Client, Calendar, TransportImage
+from .models import Transport, RentalApplication, Client, Calendar, TransportImage, TransportTariff, business_date
 from website.models import Advantages, Blog, Review, TransportSale
 from .forms import RentalApplicationForm
-from django.http import HttpResponse, JsonResponse
+from .pagination import KeysetPaginationMixin
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from docx import Document
 from django.template.defaultfilters import date as _date
 from django.contrib.auth.models import Group, Permission, User
@@ -18,6 +19,7 @@ from django.urls import path
 from django.shortcuts import render
 from urllib.parse import quote
 from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import condition
 import json
 from django.db import models
 from django_summernote.admin import SummernoteModelAdmin
@@ -128,20 +130,26 @@ class OverdueStatusFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
+        # То же правило, что у бейджа статуса: московская дата, статус «Просрочена» тоже считается
         if self.value() == 'yes':
-            return queryset.filter(status='active').filter(rental_end_date__lt=datetime.now().date())
+            return queryset.overdue()
         if self.value() == 'no':
-            return queryset.exclude(status='active', rental_end_date__lt=datetime.now().date())
+            return queryset.not_overdue()
         return queryset
 
 class TransportImageInline(admin.TabularInline):
     model = TransportImage
     extra = 1
 
+class TransportTariffInline(admin.TabularInline):
+    model = TransportTariff
+    extra = 0
+    fields = ('valid_from', 'price_per_day', 'price_3_6_days', 'price_7_30_days', 'price_30_plus_days')
+
 @admin.register(Transport)
 class TransportAdmin(SummernoteModelAdmin):
     summernote_fields = ('description',)
-    inlines = [TransportImageInline]
+    inlines = [TransportTariffInline, TransportImageInline]
     list_display = (
         'number', 'name', 'model', 'year', 'color', 'registration_number', 'vin_number',
         'price_per_day', 'price_3_6_days', 'price_7_30_days', 'price_30_plus_days', 'city', 'category', 'transmission'
@@ -165,7 +173,8 @@ class TransportAdmin(SummernoteModelAdmin):
             'fields': ('description',)
         }),
         ('Цены', {
-            'fields': ('price_per_day', 'price_3_6_days', 'price_7_30_days', 'price_30_plus_days')
+            'fields': ('price_per_day', 'price_3_6_days', 'price_7_30_days', 'price_30_plus_days'),
+            'description': 'Применяются, если на дату начала аренды нет тарифа из списка ниже',
         }),
     )
 
@@ -186,7 +195,7 @@ class TransportAdmin(SummernoteModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(RentalApplication)
-class RentalApplicationAdmin(admin.ModelAdmin):
+class RentalApplicationAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     form = RentalApplicationForm
     list_display = ('get_colored_status', 'full_name', 'phone_number', 'transport', 'rental_start_date', 
                    'rental_end_date', 'rental_days_display', 'get_rate_type_display',
@@ -199,6 +208,8 @@ class RentalApplicationAdmin(admin.ModelAdmin):
                     'transport__name', 'transport__model')
     date_hierarchy = 'rental_start_date'
     list_per_page = 30
+    list_select_related = ('transport', 'created_by')
+    keyset_ordering = ('-created_at', '-id')
     
     def get_fieldsets(self, request, obj=None):
         base_fields = (
@@ -231,10 +242,12 @@ class RentalApplicationAdmin(admin.ModelAdmin):
     def rental_days_display(self, obj):
         return format_html('<span style="color: #28a745; font-weight: bold;">{} суток</span>', obj.get_rental_days())
     rental_days_display.short_description = 'Количество суток'
+    rental_days_display.admin_order_field = 'rental_days'
 
     def daily_rate_display(self, obj):
         return format_html('<span style="color: #28a745; font-weight: bold;">{} ₽/день</span>', f"{obj.get_daily_rate():,}")
     daily_rate_display.short_description = 'Стоимость в сутки'
+    daily_rate_display.admin_order_field = 'daily_rate'
 
     def get_rate_type_display(self, obj):
         return obj.get_rate_type()
@@ -247,10 +260,12 @@ class RentalApplicationAdmin(admin.ModelAdmin):
     def get_discount_amount_display(self, obj):
         return f"{obj.get_discount_amount():,} ₽"
     get_discount_amount_display.short_description = 'Сумма скидки'
+    get_discount_amount_display.admin_order_field = 'discount_amount'
 
     def get_total_cost_display(self, obj):
         return f"{obj.calculate_total_cost():,} ₽"
     get_total_cost_display.short_description = 'Итого со скидкой'
+    get_total_cost_display.admin_order_field = 'total_cost'
 
     def get_security_deposit_display(self, obj):
         return f"{int(obj.security_deposit):,} ₽"
@@ -502,7 +517,7 @@ class RentalApplicationAdmin(admin.ModelAdmin):
             obj.get_status_display()
         )
     get_colored_status.short_description = 'Статус'
-    get_colored_status.admin_order_field = 'status'
+    get_colored_status.admin_order_field = 'status_rank'
 
     list_filter = ('status', 'rental_start_date', 'rental_end_date', 'created_at', 'discount', 'how_did_you_find_us', OverdueStatusFilter)
 
@@ -514,10 +529,16 @@ class RentalApplicationAdmin(admin.ModelAdmin):
             # Get the filtered queryset
             qs = response.context_data['cl'].queryset
             
-            # Calculate totals
-            total_cost = sum(app.calculate_total_cost() for app in qs)
-            total_security_deposit = sum(int(app.security_deposit or 0) for app in qs)
-            total_days = sum(app.get_rental_days() for app in qs)
+            # Итоги одним запросом: сохраненный снимок стоимости, а для заявок без него — расчет в SQL
+            from django.db.models.functions import Coalesce
+            totals = qs.with_pricing().aggregate(
+                cost_sum=Sum(Coalesce('total_cost', 'live_total_cost', output_field=models.IntegerField())),
+                deposit_sum=Sum('security_deposit'),
+                days_sum=Sum(Coalesce('rental_days', 'live_rental_days', output_field=models.IntegerField())),
+            )
+            total_cost = int(totals['cost_sum'] or 0)
+            total_security_deposit = int(totals['deposit_sum'] or 0)
+            total_days = int(totals['days_sum'] or 0)
             
             # Add totals to the context
             response.context_data['total_cost'] = f"{total_cost:,} ₽"
@@ -535,18 +556,102 @@ class RentalApplicationAdmin(admin.ModelAdmin):
         urls = super().get_urls()
         custom_urls = [
             path('analytics/', self.admin_site.admin_view(self.analytics_view), name='rentalapplication_analytics'),
+            path('free-windows/', self.admin_site.admin_view(self.free_windows_view), name='rentalapplication_free_windows'),
+            path('utilisation/', self.admin_site.admin_view(self.utilisation_view), name='rentalapplication_utilisation'),
         ]
         return custom_urls + urls
 
+    def free_windows_view(self, request):
+        """Поиск ближайших свободных окон по транспорту"""
+        from .availability import find_free_windows
+        from .models import TRANSMISSION_CHOICES, CITY_CHOICES
+        from .views import parse_free_window_params, DEFAULT_WINDOW_HORIZON_DAYS
+
+        params = request.GET.copy()
+        if not request.user.is_superuser:
+            profile = getattr(request.user, 'profile', None)
+            params['city'] = profile.city if profile else ''
+
+        windows = None
+        error = None
+        if params.get('duration'):
+            try:
+                search = parse_free_window_params(params, city=params.get('city') or None)
+            except ValueError as e:
+                error = str(e)
+            else:
+                if not request.user.is_superuser and not search['city']:
+                    windows = []
+                else:
+                    windows = find_free_windows(**search)
+
+        categories = (
+            Transport.objects.exclude(category__isnull=True).exclude(category='')
+            .order_by('category').values_list('category', flat=True).distinct()
+        )
+        context = dict(
+            self.admin_site.each_context(request),
+            params=params,
+            windows=windows,
+            error=error,
+            categories=categories,
+            transmission_choices=TRANSMISSION_CHOICES,
+            city_choices=CITY_CHOICES,
+            default_horizon=DEFAULT_WINDOW_HORIZON_DAYS,
+            opts=self.model._meta,
+            title='Поиск свободных окон',
+        )
+        return render(request, 'admin/rentals/rentalapplication/free_windows.html', context)
+
+    def utilisation_view(self, request):
+        """Загрузка парка: доля суток в аренде по транспорту, категориям, городам и месяцам"""
+        from .reports import fleet_utilisation, default_report_period
+        from .views import _parse_date
+        from .models import CITY_CHOICES
+
+        params = request.GET.copy()
+        if not request.user.is_superuser:
+            profile = getattr(request.user, 'profile', None)
+            params['city'] = profile.city if profile else ''
+
+        default_start, default_end = default_report_period()
+        error = None
+        period_start = _parse_date(params.get('start_date')) or default_start
+        period_end = _parse_date(params.get('end_date')) or default_end
+        if period_end < period_start:
+            error = 'Дата окончания не может быть раньше даты начала'
+            period_start, period_end = default_start, default_end
+
+        report = None
+        if request.user.is_superuser or params.get('city'):
+            report = fleet_utilisation(period_start, period_end, city=params.get('city') or None)
+
+        context = dict(
+            self.admin_site.each_context(request),
+            params=params,
+            period_start=period_start,
+            period_end=period_end,
+            report=report,
+            error=error,
+            city_choices=CITY_CHOICES,
+            opts=self.model._meta,
+            title='Загрузка парка',
+        )
+        return render(request, 'admin/rentals/rentalapplication/utilisation.html', context)
+
     def analytics_view(self, request):
         from django.db.models import Count, Sum, Avg, Q
         from .models import RentalApplication, Transport, Client
         # Пример простой аналитики
         total = RentalApplication.objects.count()
-        by_status_raw = list(RentalApplication.objects.values('status').annotate(count=Count('id')).order_by('status'))
+        # Просроченные активные заявки считаются отдельно, как в списке заявок
+        by_status_raw = list(
+            RentalApplication.objects.with_effective_status().values('effective_status')
+            .annotate(count=Count('id')).order_by('effective_status')
+        )
         status_map = dict(RentalApplication.STATUS_CHOICES)
         by_status = [
-            {'status': status_map.get(item['status'], item['status']), 'count': item['count']}
+            {'status': status_map.get(item['effective_status'], item['effective_status']), 'count': item['count']}
             for item in by_status_raw
         ]
         total_sum = RentalApplication.objects.aggregate(total=Sum('security_deposit'))['total']
@@ -660,7 +765,8 @@ class RentalApplicationAdmin(admin.ModelAdmin):
         )
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        # Статус с учетом просрочки и сумма скидки считаются в SQL: по ним работают бейдж и сортировка
+        qs = super().get_queryset(request).with_effective_status().with_status_rank().with_discount_amount()
         if request.user.is_superuser:
             return qs
         profile = getattr(request.user, 'profile', None)
@@ -953,141 +1059,116 @@ class ClientAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
 
+def _calendar_feed_params(request):
+    """
+    Параметры ленты календаря из запроса FullCalendar: даты окна, транспорт и город менеджера.
+    None — у менеджера не задан город и лента пуста; ValueError — неверная дата или id транспорта.
+    """
+    transport_ids = request.GET.getlist('transport_ids[]')  # Для множественного выбора
+    transport_id = request.GET.get('transport_id')
+    # "all" или пустое значение — весь транспорт
+    if not transport_ids and transport_id and transport_id != 'all':
+        transport_ids = [transport_id]
+    try:
+        transport_ids = [int(value) for value in transport_ids]
+    except ValueError:
+        raise ValueError(f"Invalid transport id: {', '.join(transport_ids)}")
+
+    # Фильтрация по городу менеджера
+    city = None
+    if not request.user.is_superuser:
+        profile = getattr(request.user, 'profile', None)
+        if not profile:
+            return None
+        city = profile.city
+
+    # FullCalendar отправляет даты в формате YYYY-MM-DD
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+    try:
+        start_date = datetime.strptime(start.split('T')[0], '%Y-%m-%d').date() if start else None
+        end_date = datetime.strptime(end.split('T')[0], '%Y-%m-%d').date() if end else None
+    except ValueError as e:
+        raise ValueError(f'Invalid date format: {str(e)}')
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'city': city,
+        'transport_ids': transport_ids or None,
+    }
+
+
+def _calendar_feed_etag(request, returns=False):
+    """
+    ETag ленты календаря; None — без условного GET (неверные параметры, пустая лента или ошибка
+    при расчете). Ошибки здесь не выбрасываются: их разбирает и возвращает в JSON сама лента.
+    """
+    from .calendar_feed import feed_etag
+    try:
+        params = _calendar_feed_params(request)
+        if params is None:
+            return None
+        return feed_etag(returns=returns, **params)
+    except Exception:
+        return None
+
+
 @admin.register(Calendar)
-class CalendarAdmin(admin.ModelAdmin):
+class CalendarAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ('transport', 'title', 'start', 'end', 'status')
     list_filter = ('transport', 'status')
     search_fields = ('title', 'transport__name', 'transport__model')
     date_hierarchy = 'start'
+    keyset_ordering = ('start', 'id')
 
     @staticmethod
     def calendar_view(request):
         from .models import Transport, Calendar
+        from .calendar_feed import status_counts
         transports = Transport.objects.all()
-        events = Calendar.objects.all()
-        if not request.user.is_superuser:
+        counts = {}
+        if request.user.is_superuser:
+            counts = status_counts()
+        else:
             profile = getattr(request.user, 'profile', None)
             if profile:
                 transports = transports.filter(city=profile.city)
-                events = events.filter(city=profile.city)
+                counts = status_counts(profile.city)
             else:
                 transports = Transport.objects.none()
-                events = Calendar.objects.none()
-        # Получаем статистику по статусам заявок
-        from django.db.models import Count
-        status_stats = events.values('status').annotate(
-            count=Count('id')
-        ).order_by('status')
-        
-        # Формируем статистику для отображения
-        stats = {}
-        total_rentals = 0
-        for stat in status_stats:
-            status_display = dict(RentalApplication.STATUS_CHOICES).get(stat['status'], stat['status'])
-            stats[stat['status']] = {
-                'count': stat['count'],
-                'display': status_display
-            }
-            total_rentals += stat['count']
+
+        # Статистика по статусам заявок и ручных событий
+        status_display = dict(RentalApplication.STATUS_CHOICES)
+        stats = {
+            status: {'count': count, 'display': status_display.get(status, status)}
+            for status, count in counts.items()
+        }
         
         context = {
             'transports': transports,
             'title': 'Календарь аренды',
             'opts': Calendar._meta,
             'stats': stats,
-            'total_rentals': total_rentals,
+            'total_rentals': sum(counts.values()),
         }
         return render(request, 'admin/calendar.html', context)
 
     @staticmethod
+    @condition(etag_func=lambda request: _calendar_feed_etag(request))
     def calendar_events(request):
+        from .calendar_feed import booking_events, stream_json_array
         try:
-            transport_id = request.GET.get('transport_id')
-            transport_ids = request.GET.getlist('transport_ids[]')  # Для множественного выбора
-            start = request.GET.get('start')
-            end = request.GET.get('end')
-
-            # Определяем фильтр для транспорта
-            if transport_ids:
-                # Если переданы ID нескольких транспортов
-                events = Calendar.objects.filter(transport_id__in=transport_ids)
-            elif not transport_id or transport_id == 'all':
-                # Если transport_id не указан или равен "all", показываем все события
-                events = Calendar.objects.all()
-            else:
-                # Фильтруем по одному транспорту
-                events = Calendar.objects.filter(transport_id=transport_id)
-
-            # Фильтрация по городу менеджера
-            if not request.user.is_superuser:
-                profile = getattr(request.user, 'profile', None)
-                if profile:
-                    events = events.filter(city=profile.city)
-                else:
-                    events = events.none()
-
-            if start:
-                try:
-                    # FullCalendar отправляет даты в формате YYYY-MM-DD
-                    start_date = datetime.strptime(start.split('T')[0], '%Y-%m-%d')
-                    events = events.filter(start__date__gte=start_date.date())
-                except (ValueError, IndexError) as e:
-                    return JsonResponse({'error': f'Invalid start date format: {str(e)}'}, status=400)
-            
-            if end:
-                try:
-                    # FullCalendar отправляет даты в формате YYYY-MM-DD
-                    end_date = datetime.strptime(end.split('T')[0], '%Y-%m-%d')
-                    events = events.filter(end__date__lte=end_date.date())
-                except (ValueError, IndexError) as e:
-                    return JsonResponse({'error': f'Invalid end date format: {str(e)}'}, status=400)
-
-            events_data = []
-            for event in events:
-                color = {
-                    RentalApplication.STATUS_RESERVED: '#ffc107',  # желтый
-                    RentalApplication.STATUS_ACTIVE: '#28a745',    # зеленый
-                    RentalApplication.STATUS_COMPLETED: '#17a2b8', # голубой
-                    RentalApplication.STATUS_CANCELLED: '#dc3545', # красный
-                }.get(event.status, '#6c757d')  # серый по умолчанию
-
-                # Добавляем информацию о транспорте в заголовок события
-                title = f"{event.title} (№{event.transport.number} - {event.transport.name} {event.transport.model})"
-
-                # Получаем дополнительную информацию о заявке для tooltip
-                extended_props = {
-                    'transport': f"№{event.transport.number} - {event.transport.name} {event.transport.model}",
-                    'transportNumber': event.transport.number,
-                    'transportId': event.transport.id,
-                    'status': event.status,
-                    'statusDisplay': dict(RentalApplication.STATUS_CHOICES).get(event.status, event.status),
-                }
-
-                # Добавляем информацию о стоимости и депозите, если есть связанная заявка
-                if event.rental_application:
-                    rental = event.rental_application
-                    extended_props.update({
-                        'clientName': rental.full_name,
-                        'clientPhone': str(rental.phone_number),
-                        'cost': f"{rental.calculate_total_cost():,}",
-                        'deposit': f"{int(rental.security_deposit or 0):,}",
-                        'discount': f"{rental.discount}%",
-                        'dailyRate': f"{rental.get_daily_rate():,}",
-                        'rentalDays': rental.get_rental_days(),
-                    })
-
-                events_data.append({
-                    'id': event.rental_application.id if event.rental_application else event.id,
-                    'title': title,
-                    'start': event.start.isoformat(),
-                    'end': event.end.isoformat(),
-                    'allDay': event.all_day,
-                    'color': color,
-                    'url': f'/admin/rentals/rentalapplication/{event.rental_application.id}/change/' if event.rental_application else None,
-                    'extendedProps': extended_props,
-                })
-
-            return JsonResponse(events_data, safe=False)
+            try:
+                params = _calendar_feed_params(request)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            if params is None:
+                return JsonResponse([], safe=False)
+
+            # Запросы строятся и транспорт читается при вызове, их ошибки попадают в except ниже;
+            # строки событий читаются уже при передаче ответа (см. calendar_feed)
+            events = booking_events(**params)
+            return StreamingHttpResponse(stream_json_array(events), content_type='application/json')
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -1112,15 +1193,12 @@ class CalendarAdmin(admin.ModelAdmin):
 def return_calendar_view(request):
     from .models import Calendar, Transport
     transports = Transport.objects.all()
-    events = Calendar.objects.all()
     if not request.user.is_superuser:
         profile = getattr(request.user, 'profile', None)
         if profile:
             transports = transports.filter(city=profile.city)
-            events = events.filter(city=profile.city)
         else:
             transports = Transport.objects.none()
-            events = Calendar.objects.none()
     context = {
         'transports': transports,
         'title': 'Календарь сдачи транспорта',
@@ -1129,66 +1207,59 @@ def return_calendar_view(request):
     return render(request, 'admin/calendar_returns.html', context)
 
 @staff_member_required
+@condition(etag_func=lambda request: _calendar_feed_etag(request, returns=True))
 def return_calendar_events(request):
-    from .models import Calendar, RentalApplication
+    from .calendar_feed import return_events, stream_json_array
     try:
-        transport_id = request.GET.get('transport_id')
-        start = request.GET.get('start')
-        end = request.GET.get('end')
+        try:
+            params = _calendar_feed_params(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if params is None:
+            return JsonResponse([], safe=False)
+
+        # Запросы строятся и транспорт читается при вызове, их ошибки попадают в except ниже;
+        # строки событий читаются уже при передаче ответа (см. calendar_feed)
+        events = return_events(**params)
+        return StreamingHttpResponse(stream_json_array(events), content_type='application/json')
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
-        events = Calendar.objects.all()
-        if transport_id and transport_id != 'all':
-            events = events.filter(transport_id=transport_id)
+@staff_member_required
+def calendar_occupancy(request):
+    """Компактная карта занятости транспорта за месяц для сетки календаря"""
+    from .availability import fleet_occupancy, OCCUPANCY_STATUS_CODES
+    try:
+        month = request.GET.get('month')
+        if month:
+            month_date = datetime.strptime(month, '%Y-%m').date()
+        else:
+            month_date = business_date()
 
-        # Фильтрация по городу менеджера
+        city = request.GET.get('city') or None
         if not request.user.is_superuser:
             profile = getattr(request.user, 'profile', None)
-            if profile:
-                events = events.filter(city=profile.city)
-            else:
-                events = events.none()
-
-        if start:
-            from datetime import datetime
-            start_date = datetime.strptime(start.split('T')[0], '%Y-%m-%d')
-            events = events.filter(end__date__gte=start_date.date())
-        if end:
-            from datetime import datetime
-            end_date = datetime.strptime(end.split('T')[0], '%Y-%m-%d')
-            events = events.filter(end__date__lte=end_date.date())
-
-        events_data = []
-        for event in events:
-            color = {
-                RentalApplication.STATUS_RESERVED: '#ffc107',
-                RentalApplication.STATUS_ACTIVE: '#28a745',
-                RentalApplication.STATUS_COMPLETED: '#17a2b8',
-                RentalApplication.STATUS_CANCELLED: '#dc3545',
-            }.get(event.status, '#6c757d')
-            title = f"Возврат: №{event.transport.number} - {event.transport.name} {event.transport.model} ({event.title})"
-            # Используем дату окончания аренды из заявки, если есть
-            if event.rental_application and event.rental_application.rental_end_date:
-                return_date = event.rental_application.rental_end_date
-            else:
-                return_date = event.end.date()
-            events_data.append({
-                'id': event.rental_application.id if event.rental_application else event.id,
-                'title': title,
-                'start': return_date.isoformat(),
-                'end': return_date.isoformat(),
-                'allDay': True,
-                'color': color,
-                'url': f'/admin/rentals/rentalapplication/{event.rental_application.id}/change/' if event.rental_application else None,
-                'extendedProps': {
-                    'transport': f"№{event.transport.number} - {event.transport.name} {event.transport.model}",
-                    'transportNumber': event.transport.number,
-                    'status': event.status,
-                }
-            })
-        return JsonResponse(events_data, safe=False)
+            if not profile:
+                return JsonResponse({'error': 'Не задан город менеджера'}, status=403)
+            city = profile.city
+
+        data = fleet_occupancy(month_date.year, month_date.month, city=city)
+        data['statuses'] = {code: status for status, code in OCCUPANCY_STATUS_CODES.items()}
+        return JsonResponse(data)
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid month format: {str(e)}'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@staff_member_required
+def availability_cache_stats(request):
+    """Статистика попаданий в кэш доступности транспорта"""
+    from .availability_cache import stats, reset_stats
+    data = stats()
+    if request.GET.get('reset') and request.user.is_superuser:
+        reset_stats()
+    return JsonResponse(data)
+
 @admin.register(Advantages)
 class AdvantagesAdmin(SummernoteModelAdmin):
     summernote_fields = ('text',)
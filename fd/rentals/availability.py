@@ -0,0 +1,355 @@
+"""
+Сервис доступности транспорта.
+
+Единая точка для вопроса «какой транспорт свободен в период [start, end]».
+Используется AJAX-выпадающим списком, формой заявки и Transport.check_availability,
+чтобы правило пересечения броней было описано в одном месте.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q
+
+from .models import RentalApplication, Transport, TransportDayOccupancy
+from .pricing import transport_price_annotations
+
+# Заявки в этих статусах не занимают транспорт
+INACTIVE_STATUSES = RentalApplication.INACTIVE_STATUSES
+# Заявки в этих статусах занимают транспорт
+OCCUPYING_STATUSES = RentalApplication.OCCUPYING_STATUSES
+
+# Однобуквенные коды статусов для компактной карты занятости
+OCCUPANCY_STATUS_CODES = {
+    RentalApplication.STATUS_RESERVED: 'r',
+    RentalApplication.STATUS_ACTIVE: 'a',
+    RentalApplication.STATUS_OVERDUE: 'o',
+}
+
+# Поля, которых достаточно для выпадающего списка транспорта
+TRANSPORT_OPTION_FIELDS = ('id', 'number', 'name', 'model', 'vin_number')
+
+
+def lock_transport(transport_id):
+    """
+    Блокирует транспорт до конца текущей транзакции.
+
+    Вызывается внутри transaction.atomic перед проверкой доступности, чтобы брони
+    одной машины записывались по очереди, а брони разных машин не мешали друг другу.
+    """
+    transports = Transport.objects.filter(pk=transport_id)
+    if connection.features.has_select_for_update:
+        list(transports.select_for_update().values_list('pk', flat=True))
+    else:
+        # SQLite не поддерживает SELECT ... FOR UPDATE: холостой UPDATE сразу берет
+        # блокировку записи, и параллельная бронь ждет завершения этой транзакции
+        transports.update(number=F('number'))
+
+
+def overlapping_bookings(start_date, end_date, exclude_booking_id=None):
+    """Заявки, которые пересекаются с периодом [start_date, end_date] и занимают транспорт"""
+    bookings = RentalApplication.objects.filter(
+        rental_start_date__lte=end_date,
+        rental_end_date__gte=start_date,
+    ).exclude(status__in=INACTIVE_STATUSES)
+    if exclude_booking_id:
+        bookings = bookings.exclude(id=exclude_booking_id)
+    return bookings
+
+
+def available_transport(start_date, end_date, city=None, exclude_booking_id=None, include_transport_id=None):
+    """
+    Queryset транспорта, свободного в период [start_date, end_date].
+
+    Занятость проверяется коррелированным NOT EXISTS, поэтому весь ответ
+    собирается одним запросом без промежуточного списка ID.
+
+    Args:
+        city: ограничить транспортом одного города
+        exclude_booking_id: ID заявки, которую не учитываем (при редактировании)
+        include_transport_id: ID транспорта, который показываем всегда (текущий в заявке)
+    """
+    busy = overlapping_bookings(start_date, end_date, exclude_booking_id).filter(transport_id=OuterRef('pk'))
+    condition = ~Exists(busy)
+    if include_transport_id:
+        condition |= Q(pk=include_transport_id)
+    transports = Transport.objects.filter(condition)
+    if city:
+        transports = transports.filter(city=city)
+    return transports
+
+
+def transport_option_label(row):
+    """Подпись транспорта для выпадающего списка"""
+    return f"№{row['number']} {row['name']} {row['model']} ({row['vin_number']})"
+
+
+def available_transport_options(start_date, end_date, city=None, exclude_booking_id=None,
+                                category=None, transmission=None, q=None, offset=0, limit=None,
+                                priced=False):
+    """
+    Список {'id', 'text'} свободного транспорта без создания экземпляров Transport.
+
+    Фильтры, поиск и страница применяются в том же запросе; строки упорядочены
+    по номеру транспорта, чтобы страницы были стабильными.
+
+    Args:
+        category, transmission: фильтры по полям транспорта
+        q: поиск по номеру, названию, модели, госномеру и VIN
+        offset, limit: срез результата (limit=None — без ограничения)
+        priced: добавить daily_rate и total_cost за период и упорядочить по стоимости;
+            цена считается в том же запросе, что и доступность
+    """
+    transports = available_transport(start_date, end_date, city=city, exclude_booking_id=exclude_booking_id)
+    if category:
+        transports = transports.filter(category=category)
+    if transmission:
+        transports = transports.filter(transmission=transmission)
+    if q:
+        search = (
+            Q(name__icontains=q) | Q(model__icontains=q) |
+            Q(registration_number__icontains=q) | Q(vin_number__icontains=q)
+        )
+        if q.isdigit():
+            search |= Q(number=int(q))
+        transports = transports.filter(search)
+
+    if priced:
+        transports = transports.annotate(**transport_price_annotations((end_date - start_date).days, start_date))
+        rows = transports.order_by('total_cost', 'number', 'id').values(
+            *TRANSPORT_OPTION_FIELDS, 'daily_rate', 'total_cost'
+        )
+    else:
+        rows = transports.order_by('number', 'id').values(*TRANSPORT_OPTION_FIELDS)
+    if limit is not None:
+        rows = rows[offset:offset + limit]
+    elif offset:
+        rows = rows[offset:]
+
+    if priced:
+        return [
+            {
+                'id': row['id'],
+                'text': f"{transport_option_label(row)} — {row['total_cost']:,} ₽",
+                'daily_rate': row['daily_rate'],
+                'total_cost': row['total_cost'],
+            }
+            for row in rows
+        ]
+    return [{'id': row['id'], 'text': transport_option_label(row)} for row in rows]
+
+
+def find_conflict(transport_id, start_date, end_date, exclude_booking_id=None):
+    """
+    Первая бронь транспорта, пересекающаяся с периодом, или None.
+
+    Проверка идет по таблице занятости по дням — поиск по уникальному ключу
+    (транспорт, день) среди дней, занятых бронями, вместо сканирования интервалов.
+    Возвращает dict с датами брони.
+    """
+    days = TransportDayOccupancy.objects.filter(
+        transport_id=transport_id,
+        day__range=(start_date, end_date),
+        status__in=OCCUPYING_STATUSES,
+    )
+    if exclude_booking_id:
+        days = days.exclude(application_id=exclude_booking_id)
+    return days.order_by('day').values(
+        'application_id',
+        rental_start_date=F('application__rental_start_date'),
+        rental_end_date=F('application__rental_end_date'),
+    ).first()
+
+
+def occupancy_days(start_date, end_date):
+    """Дни с start_date по end_date включительно"""
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def sync_application_occupancy(application):
+    """
+    Приводит дни занятости транспорта в соответствие с заявкой.
+
+    Дни хранятся в любом статусе заявки, в том числе завершенной и отмененной.
+    Удаляются и добавляются только изменившиеся дни; смена статуса — один UPDATE.
+    """
+    existing = {
+        day: (transport_id, status)
+        for day, transport_id, status in TransportDayOccupancy.objects.filter(
+            application_id=application.pk
+        ).values_list('day', 'transport_id', 'status')
+    }
+
+    wanted = set()
+    if application.rental_start_date and application.rental_end_date:
+        wanted = set(occupancy_days(application.rental_start_date, application.rental_end_date))
+
+    stale = [
+        day for day, (transport_id, _) in existing.items()
+        if day not in wanted or transport_id != application.transport_id
+    ]
+    if stale:
+        TransportDayOccupancy.objects.filter(application_id=application.pk, day__in=stale).delete()
+
+    kept = set(existing) - set(stale)
+    if any(existing[day][1] != application.status for day in kept):
+        TransportDayOccupancy.objects.filter(application_id=application.pk).update(status=application.status)
+
+    missing = wanted - kept
+    if missing:
+        TransportDayOccupancy.objects.bulk_create([
+            TransportDayOccupancy(
+                transport_id=application.transport_id,
+                day=day,
+                application_id=application.pk,
+                status=application.status,
+            )
+            for day in sorted(missing)
+        ])
+
+
+def availability_matrix(ranges, city=None, category=None):
+    """
+    Матрица «транспорт × период» для нескольких периодов сразу.
+
+    Брони загружаются один раз для общего охвата всех периодов, после чего
+    пересечения считаются в памяти за один проход.
+
+    Args:
+        ranges: список пар (start_date, end_date)
+
+    Returns:
+        dict: {'transports': [{'id', 'text'}], 'matrix': ['10', ...]} —
+        для каждого транспорта строка, где '1' — свободен в i-м периоде, '0' — занят
+    """
+    transports = Transport.objects.all()
+    if city:
+        transports = transports.filter(city=city)
+    if category:
+        transports = transports.filter(category=category)
+    transport_rows = list(transports.order_by('number', 'id').values(*TRANSPORT_OPTION_FIELDS))
+
+    busy = {}
+    if ranges and transport_rows:
+        span_start = min(start for start, _ in ranges)
+        span_end = max(end for _, end in ranges)
+        bookings = overlapping_bookings(span_start, span_end).filter(
+            transport_id__in=transports.values('id')
+        ).values_list('transport_id', 'rental_start_date', 'rental_end_date')
+        for transport_id, booking_start, booking_end in bookings:
+            busy.setdefault(transport_id, []).append((booking_start, booking_end))
+
+    matrix = []
+    for row in transport_rows:
+        intervals = busy.get(row['id'], ())
+        matrix.append(''.join(
+            '0' if any(s <= end and e >= start for s, e in intervals) else '1'
+            for start, end in ranges
+        ))
+
+    return {
+        'transports': [{'id': row['id'], 'text': transport_option_label(row)} for row in transport_rows],
+        'matrix': matrix,
+    }
+
+
+def fleet_occupancy(year, month, city=None):
+    """
+    Карта занятости транспорта по дням месяца.
+
+    Для каждого транспорта возвращаются отрезки [первый день, последний день, код статуса]
+    (номера дней месяца), обрезанные по границам месяца. Из заявок читаются только
+    transport_id, даты и статус.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    month_start = date(year, month, 1)
+    month_end = date(year, month, days_in_month)
+
+    transports = Transport.objects.all()
+    if city:
+        transports = transports.filter(city=city)
+    transport_rows = list(transports.order_by('number', 'id').values_list('id', 'number'))
+
+    runs = {}
+    bookings = overlapping_bookings(month_start, month_end).filter(
+        transport_id__in=transports.values('id')
+    ).order_by('transport_id', 'rental_start_date').values_list(
+        'transport_id', 'rental_start_date', 'rental_end_date', 'status'
+    )
+    for transport_id, booking_start, booking_end, status in bookings:
+        first_day = max(booking_start, month_start).day
+        last_day = min(booking_end, month_end).day
+        runs.setdefault(transport_id, []).append(
+            [first_day, last_day, OCCUPANCY_STATUS_CODES.get(status, 'r')]
+        )
+
+    return {
+        'month': month_start.strftime('%Y-%m'),
+        'days': days_in_month,
+        'transports': [[transport_id, number] for transport_id, number in transport_rows],
+        'runs': runs,
+    }
+
+
+def _earliest_gap(intervals, duration_days, horizon_start, horizon_end):
+    """
+    Первая дата начала окна длиной duration_days суток внутри горизонта.
+
+    intervals — брони одного транспорта, отсортированные по дате начала.
+    Окно [start, start + duration] не должно пересекаться ни с одной бронью
+    (границы включительно, как в check_availability).
+    """
+    length = timedelta(days=duration_days)
+    cursor = horizon_start
+    for booking_start, booking_end in intervals:
+        if cursor + length < booking_start:
+            break
+        cursor = max(cursor, booking_end + timedelta(days=1))
+    if cursor + length <= horizon_end:
+        return cursor
+    return None
+
+
+def find_free_windows(duration_days, horizon_start, horizon_days, city=None, category=None,
+                      transmission=None, limit=20):
+    """
+    Ближайшие свободные окна заданной длительности по всему парку.
+
+    Брони всех подходящих машин читаются одним запросом, отсортированными по
+    (транспорт, дата начала), и обрабатываются одним проходом.
+
+    Returns:
+        list: [{'id', 'text', 'start', 'end'}] по возрастанию даты начала, не более limit
+    """
+    horizon_end = horizon_start + timedelta(days=horizon_days)
+
+    transports = Transport.objects.all()
+    if city:
+        transports = transports.filter(city=city)
+    if category:
+        transports = transports.filter(category=category)
+    if transmission:
+        transports = transports.filter(transmission=transmission)
+    transport_rows = list(transports.order_by('number', 'id').values(*TRANSPORT_OPTION_FIELDS))
+
+    intervals = {}
+    bookings = overlapping_bookings(horizon_start, horizon_end).filter(
+        transport_id__in=transports.values('id')
+    ).order_by('transport_id', 'rental_start_date').values_list(
+        'transport_id', 'rental_start_date', 'rental_end_date'
+    )
+    for transport_id, booking_start, booking_end in bookings:
+        intervals.setdefault(transport_id, []).append((booking_start, booking_end))
+
+    windows = []
+    for row in transport_rows:
+        start = _earliest_gap(intervals.get(row['id'], ()), duration_days, horizon_start, horizon_end)
+        if start is not None:
+            windows.append({
+                'id': row['id'],
+                'text': transport_option_label(row),
+                'start': start,
+                'end': start + timedelta(days=duration_days),
+            })
+    windows.sort(key=lambda window: window['start'])
+    return windows[:limit]
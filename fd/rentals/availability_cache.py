@@ -0,0 +1,120 @@
+"""
+Кэш результатов доступности транспорта.
+
+Ответы кэшируются по ключу (город, начало, конец, исключаемая заявка) вместе с версией
+данных города. Версия хранится в базе (AvailabilityVersion) и увеличивается при каждом
+изменении заявки или транспорта, поэтому все рабочие процессы сразу перестают читать
+устаревшие записи, даже если у каждого из них свой локальный кэш.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import AvailabilityVersion, CITY_CHOICES
+from .availability import available_transport_options
+
+# Ключ общей версии, которая меняется при любом изменении (для запросов без города)
+ALL_CITIES = ''
+
+# Ключ версии цен транспорта и тарифов, по ней процессы перечитывают таблицу тарифов в памяти
+TARIFFS = 'tariffs'
+
+# Время жизни записи кэша, секунд
+CACHE_TIMEOUT = 300
+
+HITS_KEY = 'availability:stats:hits'
+MISSES_KEY = 'availability:stats:misses'
+
+
+def get_version(city=None):
+    """Текущая версия данных о занятости для города (или общая, если город не указан)"""
+    version = AvailabilityVersion.objects.filter(
+        city=city or ALL_CITIES
+    ).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_version(*cities):
+    """
+    Увеличивает версию указанных городов (без аргументов — всех городов) и общую версию.
+
+    Версии увеличиваются после фиксации текущей транзакции: строку общей версии обновляет
+    каждая бронь, и если держать ее блокировку до коммита, брони разных машин и городов
+    выстраиваются в очередь. Вне транзакции версии увеличиваются сразу.
+    """
+    if cities:
+        keys = set(cities) | {ALL_CITIES}
+    else:
+        keys = {code for code, _ in CITY_CHOICES} | {ALL_CITIES}
+    transaction.on_commit(lambda: _increment_versions(keys))
+
+
+def bump_tariff_version():
+    """Увеличивает версию цен после фиксации текущей транзакции (вне транзакции — сразу)"""
+    transaction.on_commit(lambda: _increment_versions({TARIFFS}))
+
+
+def _increment_versions(keys):
+    updated = AvailabilityVersion.objects.filter(city__in=keys).update(version=F('version') + 1)
+    if updated < len(keys):
+        existing = set(AvailabilityVersion.objects.filter(city__in=keys).values_list('city', flat=True))
+        for city in keys - existing:
+            AvailabilityVersion.objects.get_or_create(city=city, defaults={'version': 1})
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счетчик вытеснен из кэша между add и incr — статистика не критична
+        pass
+
+
+def cached_available_transport_options(start_date, end_date, city=None, exclude_booking_id=None,
+                                       version=None, **filters):
+    """
+    То же, что availability.available_transport_options, но через кэш с версией города.
+
+    Дополнительные фильтры и срез (category, transmission, q, offset, limit) входят в ключ кэша.
+    version — уже прочитанная в этом запросе версия города, чтобы не читать ее повторно.
+    """
+    if version is None:
+        version = get_version(city)
+    # Свободный текст поиска может содержать что угодно, поэтому фильтры входят в ключ хэшем
+    filters_key = hashlib.md5(':'.join(
+        f"{name}={filters[name]}" for name in sorted(filters) if filters[name] not in (None, '', False)
+    ).encode()).hexdigest()
+    key = (
+        f"availability:{city or '*'}:{version}:{start_date.isoformat()}:{end_date.isoformat()}:"
+        f"{exclude_booking_id or 0}:{filters_key}"
+    )
+    options = cache.get(key)
+    if options is not None:
+        _count(HITS_KEY)
+        return options
+
+    _count(MISSES_KEY)
+    options = available_transport_options(
+        start_date, end_date, city=city, exclude_booking_id=exclude_booking_id, **filters
+    )
+    cache.set(key, options, CACHE_TIMEOUT)
+    return options
+
+
+def stats():
+    """Статистика попаданий в кэш доступности"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 1) if total else 0,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
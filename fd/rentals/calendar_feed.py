@@ -0,0 +1,304 @@
+"""
+Ленты событий календаря выдачи и календаря возвратов.
+
+События аренды строятся при чтении прямо из заявок (RentalApplication), а в модели Calendar
+хранятся только ручные события, не связанные с заявками. Сохранение заявки календарь
+не трогает, и лента не может разойтись с заявками.
+
+Ленты читаются через values() без создания экземпляров моделей: стоимость берется из снимка
+заявки или считается в SQL, подписи транспорта и статусов собираются заранее, а события
+отдаются генератором, чтобы ответ можно было передавать потоком.
+
+booking_events и return_events строят запросы и читают транспорт сразу при вызове, поэтому
+неверные параметры и недоступная база дают ошибку до начала ответа. Строки событий читаются
+уже во время передачи: если запрос упадет на середине, клиент получит оборванный JSON-массив
+со статусом 200 и должен считать такой ответ ошибкой загрузки.
+"""
+import hashlib
+import json
+from datetime import datetime, time
+
+from django.db.models import Count, IntegerField, Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Calendar, RentalApplication, business_date
+
+STATUS_COLORS = {
+    RentalApplication.STATUS_RESERVED: '#ffc107',   # желтый
+    RentalApplication.STATUS_ACTIVE: '#28a745',     # зеленый
+    RentalApplication.STATUS_COMPLETED: '#17a2b8',  # голубой
+    RentalApplication.STATUS_CANCELLED: '#dc3545',  # красный
+    RentalApplication.STATUS_OVERDUE: '#fd7e14',    # оранжевый
+}
+DEFAULT_COLOR = '#6c757d'  # серый
+
+STATUS_NAMES = dict(RentalApplication.STATUS_CHOICES)
+
+
+class _TransportLabels(dict):
+    """
+    Транспорт для подписей событий: id -> (подпись, номер).
+
+    Заранее одним запросом читается транспорт города ленты (или выбранный транспорт);
+    транспорт из другого города, на который все же ссылается заявка, дочитывается по одному.
+    """
+
+    def __init__(self, city=None, transport_ids=None):
+        from .models import Transport
+
+        transports = Transport.objects.all()
+        if transport_ids:
+            transports = transports.filter(id__in=transport_ids)
+        elif city:
+            transports = transports.filter(city=city)
+        super().__init__(self._labels(transports))
+
+    @staticmethod
+    def _labels(transports):
+        return {
+            transport_id: (f"№{number} - {name} {model}", number)
+            for transport_id, number, name, model in transports.values_list('id', 'number', 'name', 'model')
+        }
+
+    def __missing__(self, transport_id):
+        from .models import Transport
+
+        self.update(self._labels(Transport.objects.filter(id=transport_id)))
+        return self[transport_id]
+
+
+class _DayBounds:
+    """Начало и конец дня в текущем часовом поясе в ISO-формате, с запоминанием по дате"""
+
+    def __init__(self):
+        self.starts = {}
+        self.ends = {}
+
+    def start(self, day):
+        if day not in self.starts:
+            self.starts[day] = timezone.make_aware(datetime.combine(day, time.min)).isoformat()
+        return self.starts[day]
+
+    def end(self, day):
+        if day not in self.ends:
+            self.ends[day] = timezone.make_aware(datetime.combine(day, time.max)).isoformat()
+        return self.ends[day]
+
+
+def _window_bound(day):
+    """Полночь дня в текущем часовом поясе — граница окна для колонок datetime"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _application_url(application_id):
+    return f'/admin/rentals/rentalapplication/{application_id}/change/'
+
+
+def rental_applications(city=None, transport_ids=None):
+    """Заявки для календаря с транспортом и статусом с учетом просрочки (effective_status)"""
+    applications = RentalApplication.objects.with_effective_status()
+    if city:
+        applications = applications.filter(city=city)
+    if transport_ids:
+        applications = applications.filter(transport_id__in=transport_ids)
+    return applications.order_by('rental_start_date', 'id')
+
+
+def manual_events(city=None, transport_ids=None):
+    """Ручные события календаря, не связанные с заявками"""
+    events = Calendar.objects.all()
+    if city:
+        events = events.filter(city=city)
+    if transport_ids:
+        events = events.filter(transport_id__in=transport_ids)
+    return events
+
+
+def status_counts(city=None):
+    """Количество событий календаря по статусам: заявки и ручные события"""
+    counts = {}
+    applications = rental_applications(city).order_by().values('effective_status').annotate(count=Count('id'))
+    for row in applications:
+        counts[row['effective_status']] = counts.get(row['effective_status'], 0) + row['count']
+    for row in manual_events(city).order_by().values('status').annotate(count=Count('id')):
+        counts[row['status']] = counts.get(row['status'], 0) + row['count']
+    return dict(sorted(counts.items()))
+
+
+def booking_window(start_date, end_date, city, transport_ids):
+    """
+    Заявки и ручные события календаря выдачи, пересекающиеся с окном [start_date, end_date).
+
+    Конец окна не входит в него, как в запросах FullCalendar. Условие пересечения
+    (начало < конец окна И конец > начало окна) записано прямо по колонкам, без __date,
+    поэтому идет по индексам (city, начало, конец) и захватывает брони, выходящие за края окна.
+    """
+    applications = rental_applications(city, transport_ids)
+    events = manual_events(city, transport_ids)
+    if start_date:
+        # Дата окончания аренды входит в бронь: бронь по start_date еще видна в окне
+        applications = applications.filter(rental_end_date__gte=start_date)
+        events = events.filter(end__gt=_window_bound(start_date))
+    if end_date:
+        applications = applications.filter(rental_start_date__lt=end_date)
+        events = events.filter(start__lt=_window_bound(end_date))
+    return applications, events
+
+
+def return_window(start_date, end_date, city, transport_ids):
+    """Заявки и ручные события календаря возвратов с окончанием в окне [start_date, end_date)"""
+    applications = rental_applications(city, transport_ids)
+    events = manual_events(city, transport_ids)
+    if start_date:
+        applications = applications.filter(rental_end_date__gte=start_date)
+        events = events.filter(end__gte=_window_bound(start_date))
+    if end_date:
+        applications = applications.filter(rental_end_date__lt=end_date)
+        events = events.filter(end__lt=_window_bound(end_date))
+    return applications, events
+
+
+def feed_etag(start_date=None, end_date=None, city=None, transport_ids=None, returns=False):
+    """
+    Валидатор ленты для условного GET (If-None-Match).
+
+    Складывается из версии данных города (меняется при изменении транспорта, тарифов, ручных событий
+    и занятости), рабочей даты (от нее зависит просрочка), числа заявок в окне и последнего
+    updated_at среди них — его меняет любое сохранение заявки, в том числе без смены дат.
+    """
+    from .availability_cache import get_version
+
+    window = return_window if returns else booking_window
+    applications, _ = window(start_date, end_date, city, transport_ids)
+    summary = applications.order_by().aggregate(count=Count('id'), changed=Max('updated_at'))
+    parts = (
+        'returns' if returns else 'bookings', get_version(city), business_date(),
+        start_date, end_date, ','.join(map(str, sorted(transport_ids or ()))),
+        summary['count'], summary['changed'] and summary['changed'].isoformat(),
+    )
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def booking_events(start_date=None, end_date=None, city=None, transport_ids=None):
+    """
+    События календаря выдачи: аренды и ручные события, пересекающиеся с окном [start_date, end_date).
+    Запросы строятся сразу, а возвращается генератор, который читает строки при передаче ответа.
+    """
+    applications, events = booking_window(start_date, end_date, city, transport_ids)
+
+    # Снимок стоимости, а для заявок без снимка — расчет в SQL по тарифу
+    applications = applications.with_pricing().annotate(
+        cost=Coalesce('total_cost', 'live_total_cost', output_field=IntegerField()),
+        rate=Coalesce('daily_rate', 'live_daily_rate', output_field=IntegerField()),
+        days=Coalesce('rental_days', 'live_rental_days', output_field=IntegerField()),
+    ).values_list(
+        'id', 'transport_id', 'full_name', 'phone_number', 'rental_start_date', 'rental_end_date',
+        'effective_status', 'security_deposit', 'discount', 'cost', 'rate', 'days',
+    )
+    events = events.values_list('id', 'transport_id', 'title', 'start', 'end', 'all_day', 'status')
+    return _booking_rows(applications, events, _TransportLabels(city, transport_ids))
+
+
+def _booking_rows(applications, events, transports):
+    bounds = _DayBounds()
+    for (application_id, transport_id, full_name, phone_number, start, end, status,
+         deposit, discount, cost, rate, days) in applications.iterator():
+        transport, number = transports[transport_id]
+        yield {
+            'id': application_id,
+            'title': f"Аренда: {full_name} ({transport})",
+            'start': bounds.start(start),
+            'end': bounds.end(end),
+            'allDay': True,
+            'color': STATUS_COLORS.get(status, DEFAULT_COLOR),
+            'url': _application_url(application_id),
+            'extendedProps': {
+                'transport': transport,
+                'transportNumber': number,
+                'transportId': transport_id,
+                'status': status,
+                'statusDisplay': STATUS_NAMES.get(status, status),
+                'clientName': full_name,
+                'clientPhone': str(phone_number),
+                'cost': f"{cost:,}",
+                'deposit': f"{int(deposit or 0):,}",
+                'discount': f"{discount}%",
+                'dailyRate': f"{rate:,}",
+                'rentalDays': max(days, 0),
+            },
+        }
+
+    for event_id, transport_id, title, start, end, all_day, status in events:
+        transport, number = transports[transport_id]
+        yield {
+            'id': event_id,
+            'title': f"{title} ({transport})",
+            'start': timezone.localtime(start).isoformat(),
+            'end': timezone.localtime(end).isoformat(),
+            'allDay': all_day,
+            'color': STATUS_COLORS.get(status, DEFAULT_COLOR),
+            'url': None,
+            'extendedProps': {
+                'transport': transport,
+                'transportNumber': number,
+                'transportId': transport_id,
+                'status': status,
+                'statusDisplay': STATUS_NAMES.get(status, status),
+            },
+        }
+
+
+def return_events(start_date=None, end_date=None, city=None, transport_ids=None):
+    """
+    События календаря возвратов: аренды и ручные события с окончанием в окне [start_date, end_date).
+    Запросы строятся сразу, а возвращается генератор, который читает строки при передаче ответа.
+    """
+    applications, events = return_window(start_date, end_date, city, transport_ids)
+    applications = applications.values_list('id', 'full_name', 'transport_id', 'effective_status', 'rental_end_date')
+    events = events.values_list('id', 'title', 'transport_id', 'status', 'end')
+    return _return_rows(applications, events, _TransportLabels(city, transport_ids))
+
+
+def _return_rows(applications, events, transports):
+    returns = (
+        (application_id, f"Аренда: {full_name}", transport_id, status, return_date, _application_url(application_id))
+        for application_id, full_name, transport_id, status, return_date in applications.iterator()
+    )
+    manual = (
+        (event_id, title, transport_id, status, timezone.localtime(end).date(), None)
+        for event_id, title, transport_id, status, end in events
+    )
+    for source in (returns, manual):
+        for event_id, title, transport_id, status, return_date, url in source:
+            transport, number = transports[transport_id]
+            yield {
+                'id': event_id,
+                'title': f"Возврат: {transport} ({title})",
+                'start': return_date.isoformat(),
+                'end': return_date.isoformat(),
+                'allDay': True,
+                'color': STATUS_COLORS.get(status, DEFAULT_COLOR),
+                'url': url,
+                'extendedProps': {
+                    'transport': transport,
+                    'transportNumber': number,
+                    'status': status,
+                },
+            }
+
+
+def stream_json_array(items, chunk_size=200):
+    """Кодирует элементы в JSON-массив по частям, не собирая весь ответ в памяти"""
+    yield '['
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(json.dumps(item, ensure_ascii=False))
+        if len(chunk) >= chunk_size:
+            yield ('' if first else ',') + ','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']'
@@ -1,5 +1,6 @@
 from django import forms
 from .models import RentalApplication, Transport
+from .availability_cache import cached_available_transport_options
 from django.db.models import Q
 from datetime import datetime
 from django.contrib.admin.widgets import AdminDateWidget
@@ -41,9 +42,15 @@ class RentalApplicationForm(forms.ModelForm):
             except Exception:
                 pass
         
+        # Менеджер видит только транспорт своего города
+        city = None
+        if request and not request.user.is_superuser:
+            profile = getattr(request.user, 'profile', None)
+            city = profile.city if profile else None
+
         # Если это редактирование существующей заявки
         if self.instance and self.instance.pk:
-            current_transport = self.instance.transport
+            current_transport_id = self.instance.transport_id
             # Делаем поле transport необязательным при редактировании
             self.fields['transport'].required = False
             
@@ -54,34 +61,22 @@ class RentalApplicationForm(forms.ModelForm):
                     end_date = self.instance.rental_end_date
 
             if start_date and end_date:
-                # Получаем ID всех транспортных средств, у которых есть пересекающиеся брони
-                # Исключаем отмененные и завершенные заявки
-                booked_transport_ids = RentalApplication.objects.filter(
-                    Q(rental_start_date__lte=end_date) & 
-                    Q(rental_end_date__gte=start_date) &
-                    ~Q(status__in=[RentalApplication.STATUS_CANCELLED, RentalApplication.STATUS_COMPLETED])  # Исключаем отмененные и завершенные заявки
-                ).exclude(id=self.instance.id).values_list('transport_id', flat=True)
-                
-                # Фильтруем queryset для поля transport, включая текущий транспорт
+                # Свободный транспорт без учета самой заявки, плюс текущий транспорт
+                options = cached_available_transport_options(
+                    start_date, end_date, city=city, exclude_booking_id=self.instance.id
+                )
                 self.fields['transport'].queryset = Transport.objects.filter(
-                    Q(id=current_transport.id) | ~Q(id__in=booked_transport_ids)
+                    Q(id__in=[option['id'] for option in options]) | Q(id=current_transport_id)
                 )
             else:
                 # Если даты не выбраны, показываем только текущий транспорт
-                self.fields['transport'].queryset = Transport.objects.filter(id=current_transport.id)
+                self.fields['transport'].queryset = Transport.objects.filter(id=current_transport_id)
         else:
             # Для новой заявки используем стандартную логику
             if start_date and end_date:
-                # Получаем ID всех транспортных средств, у которых есть пересекающиеся брони
-                # Исключаем отмененные и завершенные заявки
-                booked_transport_ids = RentalApplication.objects.filter(
-                    Q(rental_start_date__lte=end_date) & 
-                    Q(rental_end_date__gte=start_date) &
-                    ~Q(status__in=[RentalApplication.STATUS_CANCELLED, RentalApplication.STATUS_COMPLETED])  # Исключаем отмененные и завершенные заявки
-                ).values_list('transport_id', flat=True)
-                
-                self.fields['transport'].queryset = Transport.objects.exclude(
-                    id__in=booked_transport_ids
+                options = cached_available_transport_options(start_date, end_date, city=city)
+                self.fields['transport'].queryset = Transport.objects.filter(
+                    id__in=[option['id'] for option in options]
                 )
             else:
                 self.fields['transport'].queryset = Transport.objects.all()
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rentals.availability_cache import bump_version
+from rentals.models import RentalApplication
+
+
+class Command(BaseCommand):
+    help = 'Заполняет снимок стоимости (суток, тариф, цена за сутки, итог) в заявках на аренду'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько заявок обновлять за один запрос',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать все заявки по текущим ценам, а не только заявки без снимка',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        applications = RentalApplication.objects.all()
+        if not options['all']:
+            applications = applications.filter(total_cost__isnull=True)
+
+        updated = 0
+        last_id = 0
+        cities = set()
+        while True:
+            # Стоимость считается в SQL по текущим ценам транспорта, экземпляры моделей не загружаются
+            rows = list(
+                applications.filter(pk__gt=last_id).order_by('pk').with_pricing().values_list(
+                    'pk', 'city', 'transport__city',
+                    'live_rental_days', 'live_rate_tier', 'live_daily_rate', 'live_total_cost',
+                )[:batch_size]
+            )
+            if not rows:
+                break
+
+            # updated_at меняется вместе со стоимостью: от него зависят ETag лент календаря
+            now = timezone.now()
+            snapshots = [
+                RentalApplication(
+                    pk=pk,
+                    rental_days=max(rental_days, 0),
+                    rate_tier=rate_tier,
+                    daily_rate=daily_rate,
+                    total_cost=total_cost,
+                    updated_at=now,
+                )
+                for pk, _, _, rental_days, rate_tier, daily_rate, total_cost in rows
+            ]
+            with transaction.atomic():
+                RentalApplication.objects.bulk_update(snapshots, [*RentalApplication.PRICING_FIELDS, 'updated_at'])
+
+            for _, city, transport_city, *_ in rows:
+                cities.update((city, transport_city))
+            updated += len(rows)
+            last_id = rows[-1][0]
+            self.stdout.write(f"Обновлено заявок: {updated}")
+
+        if cities:
+            # Кэшированные ответы доступности и лент календаря содержат прежнюю стоимость
+            bump_version(*cities)
+        self.stdout.write(self.style.SUCCESS(f"Снимок стоимости заполнен для {updated} заявок"))
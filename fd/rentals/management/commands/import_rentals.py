@@ -0,0 +1,446 @@
+import csv
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from phonenumber_field.phonenumber import to_python as to_phone_number
+from rentals import pricing
+from rentals.availability import OCCUPYING_STATUSES, occupancy_days
+from rentals.availability_cache import TARIFFS, bump_version, get_version
+from rentals.models import (
+    CITY_CHOICES, HOW_DID_YOU_FIND_US_CHOICES, Client, RentalApplication, Transport, TransportDayOccupancy,
+)
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y', '%d/%m/%Y')
+
+# Колонки файла: имя поля заявки или его русское название (регистр не важен)
+COLUMNS = (
+    'full_name', 'phone_number', 'rental_start_date', 'rental_end_date', 'transport', 'transport_id',
+    'status', 'security_deposit', 'discount', 'passport_number', 'passport_issued_by',
+    'passport_issue_date', 'how_did_you_find_us', 'city',
+)
+REQUIRED_COLUMNS = ('full_name', 'phone_number', 'rental_start_date', 'rental_end_date')
+
+
+def _choice_lookup(choices):
+    """Код варианта по коду или по подписи (без учета регистра)"""
+    lookup = {}
+    for code, label in choices:
+        lookup[str(code).lower()] = code
+        lookup[str(label).lower()] = code
+    return lookup
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует историю аренд из CSV или XLSX: клиенты по номеру телефона, заявки, '
+        'занятость транспорта и снимок стоимости пакетными INSERT без save() на каждую строку. '
+        'Для XLSX нужен пакет openpyxl'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .xlsx')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк записывать за одну транзакцию',
+        )
+        parser.add_argument(
+            '--delimiter',
+            default=None,
+            help='Разделитель CSV (по умолчанию определяется по первой строке)',
+        )
+        parser.add_argument(
+            '--sheet',
+            default=None,
+            help='Лист XLSX (по умолчанию первый)',
+        )
+        parser.add_argument(
+            '--city',
+            choices=[code for code, _ in CITY_CHOICES],
+            default=None,
+            help='Город для строк без колонки города (по умолчанию город транспорта)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Проверить файл и посчитать строки без записи в базу',
+        )
+
+    def handle(self, *args, **options):
+        # Дни занятости и клиенты заявок ссылаются на id, которые bulk_create получает из INSERT ... RETURNING
+        if not options['dry_run'] and not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                'Импорт требует базы, которая возвращает id при пакетной вставке '
+                '(PostgreSQL, SQLite 3.35+, MariaDB 10.5+)'
+            )
+
+        self.default_city = options['city']
+        self.statuses = _choice_lookup(RentalApplication.STATUS_CHOICES)
+        self.sources = _choice_lookup(HOW_DID_YOU_FIND_US_CHOICES)
+        self.cities = _choice_lookup(CITY_CHOICES)
+        self.aliases = {}
+        for name in COLUMNS:
+            self.aliases[name] = name
+            if name != 'transport_id':
+                self.aliases[str(RentalApplication._meta.get_field(name).verbose_name).lower()] = name
+        self.aliases['номер транспорта'] = 'transport'
+
+        self._load_transports()
+        # Версия цен читается один раз: таблица тарифов не перечитывается на каждой строке
+        self.tariff_version = get_version(TARIFFS)
+        self.clients = {}  # телефон в E.164 -> id клиента, общий для всех пакетов
+        self.occupied = {}  # (транспорт, день) -> номер строки файла, занявшей день в ходе импорта
+        self.cities_touched = set()
+        self.stats = {'rows': 0, 'imported': 0, 'clients': 0, 'occupancy': 0, 'skipped': 0}
+        self.errors = []
+        self.overlaps = []
+
+        started = time.monotonic()
+        rows = self._read(options['path'], options['delimiter'], options['sheet'])
+        batch_size = options['batch_size']
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            parsed = []
+            for line, row in batch:
+                self.stats['rows'] += 1
+                try:
+                    parsed.append((line, self._parse(row)))
+                except RowError as exc:
+                    self.errors.append((line, str(exc)))
+            # Пересечения проверяются до записи пакета, поэтому и при --dry-run
+            parsed = self._skip_overlaps(parsed)
+            if parsed and not options['dry_run']:
+                with transaction.atomic():
+                    self._import_batch(parsed)
+            elif options['dry_run']:
+                self.stats['imported'] += len(parsed)
+            self.stdout.write(f"Обработано строк: {self.stats['rows']}")
+
+        if self.cities_touched:
+            bump_version(*self.cities_touched)
+        self._report(time.monotonic() - started, options['dry_run'])
+
+    # Чтение файла
+
+    def _read(self, path, delimiter, sheet):
+        """Строки файла как (номер строки, {колонка: значение}) — потоково, без чтения файла целиком"""
+        if path.lower().endswith(('.xlsx', '.xlsm')):
+            return self._read_xlsx(path, sheet)
+        return self._read_csv(path, delimiter)
+
+    def _header(self, names):
+        header = [self.aliases.get(str(name or '').strip().lower()) for name in names]
+        missing = [name for name in REQUIRED_COLUMNS if name not in header]
+        if missing:
+            raise CommandError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+        if 'transport' not in header and 'transport_id' not in header:
+            raise CommandError('В файле нет колонки транспорта (transport или transport_id)')
+        return header
+
+    def _read_csv(self, path, delimiter):
+        try:
+            source = open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f'Не удалось открыть файл: {exc}')
+        with source:
+            if delimiter is None:
+                sample = source.readline()
+                source.seek(0)
+                delimiter = ';' if sample.count(';') > sample.count(',') else ','
+            reader = csv.reader(source, delimiter=delimiter)
+            header = self._header(next(reader, []))
+            for line, values in enumerate(reader, start=2):
+                if any(value.strip() for value in values):
+                    yield line, {name: value for name, value in zip(header, values) if name}
+
+    def _read_xlsx(self, path, sheet):
+        if openpyxl is None:
+            raise CommandError('Для импорта XLSX установите openpyxl (pip install openpyxl) или сохраните файл в CSV')
+        try:
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        except (OSError, KeyError, ValueError) as exc:
+            raise CommandError(f'Не удалось открыть файл: {exc}')
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+            values = worksheet.iter_rows(values_only=True)
+            header = self._header(next(values, ()))
+            for line, cells in enumerate(values, start=2):
+                if any(cell not in (None, '') for cell in cells):
+                    yield line, {name: cell for name, cell in zip(header, cells) if name}
+        finally:
+            workbook.close()
+
+    # Разбор строки
+
+    def _load_transports(self):
+        self.transports = {}
+        self.transport_numbers = {}
+        for transport_id, number, city in Transport.objects.values_list('id', 'number', 'city'):
+            self.transports[transport_id] = city
+            self.transport_numbers.setdefault(number, []).append((transport_id, city))
+
+    @staticmethod
+    def _text(value):
+        if value is None:
+            return ''
+        return str(value).strip()
+
+    def _date(self, value, column, required=True):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        text = self._text(value)
+        if not text:
+            if required:
+                raise RowError(f'не заполнена колонка {column}')
+            return None
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.strptime(text.split(' ')[0], date_format).date()
+            except ValueError:
+                continue
+        raise RowError(f'неверная дата в колонке {column}: {text}')
+
+    def _choice(self, lookup, value, column, default=None):
+        text = self._text(value)
+        if not text:
+            return default
+        try:
+            return lookup[text.lower()]
+        except KeyError:
+            raise RowError(f'неизвестное значение в колонке {column}: {text}')
+
+    def _transport(self, row, city):
+        text = self._text(row.get('transport_id'))
+        if text:
+            try:
+                transport_id = int(float(text))
+            except ValueError:
+                raise RowError(f'неверный transport_id: {text}')
+            if transport_id not in self.transports:
+                raise RowError(f'транспорт с id {transport_id} не найден')
+            return transport_id
+
+        text = self._text(row.get('transport')).lstrip('№').strip()
+        try:
+            number = int(float(text))
+        except ValueError:
+            raise RowError(f'неверный номер транспорта: {text or "пусто"}')
+        candidates = self.transport_numbers.get(number, [])
+        if len(candidates) > 1 and city:
+            candidates = [candidate for candidate in candidates if candidate[1] == city]
+        if not candidates:
+            raise RowError(f'транспорт №{number} не найден')
+        if len(candidates) > 1:
+            raise RowError(f'транспорт №{number} есть в нескольких городах, укажите город')
+        return candidates[0][0]
+
+    def _parse(self, row):
+        full_name = self._text(row.get('full_name'))
+        if not full_name:
+            raise RowError('не заполнено ФИО')
+
+        phone = to_phone_number(self._text(row.get('phone_number')))
+        if not phone or not phone.is_valid():
+            raise RowError(f"неверный телефон: {self._text(row.get('phone_number'))}")
+
+        start_date = self._date(row.get('rental_start_date'), 'rental_start_date')
+        end_date = self._date(row.get('rental_end_date'), 'rental_end_date')
+        if start_date > end_date:
+            raise RowError('дата окончания раньше даты начала')
+
+        city = self._choice(self.cities, row.get('city'), 'city', self.default_city)
+        transport_id = self._transport(row, city)
+
+        try:
+            deposit = Decimal(self._text(row.get('security_deposit')).replace(' ', '') or 0)
+            discount = int(float(self._text(row.get('discount')).rstrip('%') or 0))
+        except (InvalidOperation, ValueError):
+            raise RowError('неверный залог или скидка')
+        if discount not in dict(RentalApplication.DISCOUNT_CHOICES):
+            raise RowError(f'неверная скидка: {discount}')
+
+        return {
+            'full_name': full_name,
+            'phone_number': phone.as_e164,
+            'rental_start_date': start_date,
+            'rental_end_date': end_date,
+            'transport_id': transport_id,
+            'status': self._choice(self.statuses, row.get('status'), 'status', RentalApplication.STATUS_COMPLETED),
+            'security_deposit': deposit,
+            'discount': discount,
+            'passport_number': self._text(row.get('passport_number')) or None,
+            'passport_issued_by': self._text(row.get('passport_issued_by')) or None,
+            'passport_issue_date': self._date(row.get('passport_issue_date'), 'passport_issue_date', required=False),
+            'how_did_you_find_us': self._choice(self.sources, row.get('how_did_you_find_us'), 'how_did_you_find_us'),
+            'city': city or self.transports[transport_id],
+        }
+
+    # Запись пакета
+
+    def _upsert_clients(self, rows):
+        """Создает недостающих клиентов и дополняет пустые паспортные данные существующих"""
+        batch = {}
+        for row in rows:
+            # Последняя строка пакета с этим телефоном — самые свежие данные клиента
+            batch[row['phone_number']] = row
+
+        unknown = [phone for phone in batch if phone not in self.clients]
+        existing = {
+            client.phone_number.as_e164: client
+            for client in Client.objects.filter(phone_number__in=unknown)
+        }
+        updated = []
+        for phone, client in existing.items():
+            row = batch[phone]
+            changed = False
+            for name in ('passport_number', 'passport_issued_by', 'passport_issue_date', 'how_did_you_find_us'):
+                if row[name] and not getattr(client, name):
+                    setattr(client, name, row[name])
+                    changed = True
+            if changed:
+                updated.append(client)
+            self.clients[phone] = client.pk
+        if updated:
+            Client.objects.bulk_update(
+                updated, ['passport_number', 'passport_issued_by', 'passport_issue_date', 'how_did_you_find_us']
+            )
+
+        new_phones = [phone for phone in batch if phone not in self.clients]
+        created = Client.objects.bulk_create([
+            Client(
+                full_name=row['full_name'],
+                phone_number=phone,
+                passport_number=row['passport_number'],
+                passport_issued_by=row['passport_issued_by'],
+                passport_issue_date=row['passport_issue_date'],
+                how_did_you_find_us=row['how_did_you_find_us'],
+                city=row['city'],
+            )
+            for phone, row in ((phone, batch[phone]) for phone in new_phones)
+        ])
+        for phone, client in zip(new_phones, created):
+            self.clients[phone] = client.pk
+        self.stats['clients'] += len(created)
+
+    def _occupied_in_db(self, rows):
+        """Дни, уже занятые в базе транспортом пакета в пределах дат пакета"""
+        active = [row for row in rows if row['status'] in OCCUPYING_STATUSES]
+        if not active:
+            return {}
+        return {
+            (transport_id, day): application_id
+            for transport_id, day, application_id in TransportDayOccupancy.objects.filter(
+                transport_id__in={row['transport_id'] for row in active},
+                day__gte=min(row['rental_start_date'] for row in active),
+                day__lte=max(row['rental_end_date'] for row in active),
+                status__in=OCCUPYING_STATUSES,
+            ).values_list('transport_id', 'day', 'application_id')
+        }
+
+    def _claim_days(self, line, row, occupied):
+        """
+        Занимает дни брони. Если хотя бы один день уже занят заявкой из базы или более ранней
+        строкой файла, запоминает пересечение и возвращает False: такая строка не импортируется,
+        а ее статус не подменяется, чтобы файл можно было исправить и загрузить повторно.
+        """
+        days = occupancy_days(row['rental_start_date'], row['rental_end_date'])
+        for day in days:
+            key = (row['transport_id'], day)
+            if key in occupied:
+                self.overlaps.append((line, f'с заявкой {occupied[key]}', day))
+                return False
+            if key in self.occupied:
+                self.overlaps.append((line, f'со строкой {self.occupied[key]}', day))
+                return False
+        for day in days:
+            self.occupied[(row['transport_id'], day)] = line
+        return True
+
+    def _skip_overlaps(self, parsed):
+        """Строки пакета без броней, пересекающихся с базой или с предыдущими строками файла"""
+        occupied = self._occupied_in_db([row for _, row in parsed])
+        accepted = []
+        for line, row in parsed:
+            if row['status'] in OCCUPYING_STATUSES and not self._claim_days(line, row, occupied):
+                self.stats['skipped'] += 1
+                continue
+            accepted.append((line, row))
+        return accepted
+
+    def _import_batch(self, parsed):
+        rows = [row for _, row in parsed]
+        self._upsert_clients(rows)
+
+        applications = []
+        for _, row in parsed:
+            days = max((row['rental_end_date'] - row['rental_start_date']).days, 0)
+            # Снимок стоимости по тарифу на дату начала — из таблицы тарифов в памяти, без запросов
+            quote = pricing.quote_transport(
+                row['transport_id'], days, row['discount'], row['rental_start_date'], version=self.tariff_version
+            )
+            application = RentalApplication(
+                client_id=self.clients[row['phone_number']],
+                rental_days=days,
+                rate_tier=quote['rate_tier'],
+                daily_rate=quote['daily_rate'],
+                total_cost=quote['total_cost'],
+                **row,
+            )
+            if application.status == RentalApplication.STATUS_ACTIVE:
+                application.original_total_cost = quote['total_cost']
+            applications.append(application)
+        RentalApplication.objects.bulk_create(applications)
+
+        occupancy = []
+        for application in applications:
+            self.cities_touched.update((application.city, self.transports[application.transport_id]))
+            for day in occupancy_days(application.rental_start_date, application.rental_end_date):
+                occupancy.append(TransportDayOccupancy(
+                    transport_id=application.transport_id,
+                    day=day,
+                    application_id=application.pk,
+                    status=application.status,
+                ))
+        TransportDayOccupancy.objects.bulk_create(occupancy)
+
+        self.stats['imported'] += len(applications)
+        self.stats['occupancy'] += len(occupancy)
+
+    def _report(self, elapsed, dry_run):
+        for line, message in self.errors:
+            self.stdout.write(self.style.ERROR(f"Строка {line}: {message}"))
+        for line, owner, day in self.overlaps:
+            self.stdout.write(self.style.WARNING(
+                f"Строка {line}: бронь пересекается {owner} на {day.strftime('%d.%m.%Y')} и пропущена"
+            ))
+
+        rate = self.stats['rows'] / elapsed if elapsed else 0
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f"Проверено строк: {self.stats['rows']}, к импорту: {self.stats['imported']}, "
+                f"пересечений: {self.stats['skipped']}, с ошибками: {len(self.errors)}"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Импортировано заявок: {self.stats['imported']}, новых клиентов: {self.stats['clients']}, "
+            f"дней занятости: {self.stats['occupancy']}, пропущено из-за пересечений: {self.stats['skipped']}, "
+            f"строк с ошибками: {len(self.errors)} ({rate:.0f} строк/с)"
+        ))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rentals.models import RentalApplication, TransportDayOccupancy
+from rentals.availability import OCCUPYING_STATUSES, occupancy_days
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает таблицу занятости транспорта по дням из заявок на аренду'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк занятости вставлять за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        applications = RentalApplication.objects.order_by(
+            'rental_start_date', 'id'
+        ).values_list('id', 'transport_id', 'rental_start_date', 'rental_end_date', 'status')
+
+        occupied = {}
+        conflicts = []
+        rows = []
+        created = 0
+
+        with transaction.atomic():
+            TransportDayOccupancy.objects.all().delete()
+
+            for application_id, transport_id, start_date, end_date, status in applications.iterator():
+                for day in occupancy_days(start_date, end_date):
+                    if status in OCCUPYING_STATUSES:
+                        owner = occupied.get((transport_id, day))
+                        if owner is not None:
+                            # День уже занят более ранней заявкой — оставляем ее и сообщаем о пересечении
+                            if not conflicts or conflicts[-1][:2] != (application_id, owner):
+                                conflicts.append((application_id, owner, day))
+                            continue
+                        occupied[(transport_id, day)] = application_id
+                    rows.append(TransportDayOccupancy(
+                        transport_id=transport_id,
+                        day=day,
+                        application_id=application_id,
+                        status=status,
+                    ))
+                    if len(rows) >= batch_size:
+                        TransportDayOccupancy.objects.bulk_create(rows)
+                        created += len(rows)
+                        rows = []
+
+            TransportDayOccupancy.objects.bulk_create(rows)
+            created += len(rows)
+
+        for application_id, owner, day in conflicts:
+            self.stdout.write(self.style.WARNING(
+                f"Заявка {application_id} пересекается с заявкой {owner} начиная с {day.strftime('%d.%m.%Y')}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Записано дней занятости: {created}, пересечений: {len(conflicts)}"
+        ))
@@ -0,0 +1,116 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rentals.models import RentalApplication, TransportDayOccupancy, business_date
+from rentals.availability_cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+# Срок резерва, если в настройках не задан RENTAL_RESERVATION_TTL_DAYS
+DEFAULT_RESERVATION_TTL_DAYS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит просроченные активные аренды в статус «Просрочена» и отменяет резервы, '
+        'по которым клиент не пришел. Запускается по расписанию каждые несколько минут'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reservation-ttl-days',
+            type=int,
+            default=getattr(settings, 'RENTAL_RESERVATION_TTL_DAYS', DEFAULT_RESERVATION_TTL_DAYS),
+            help=(
+                'Через сколько суток после даты начала неактивированный резерв отменяется '
+                '(по умолчанию настройка RENTAL_RESERVATION_TTL_DAYS)'
+            ),
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Повторять каждые N секунд (0 — выполнить один раз)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько заявок будет изменено',
+        )
+
+    def handle(self, *args, **options):
+        if options['reservation_ttl_days'] < 1:
+            raise CommandError('Срок резерва должен быть не меньше одних суток')
+        while True:
+            self.run_once(options['reservation_ttl_days'], options['dry_run'])
+            if not options['interval']:
+                break
+            # Не держим соединение с базой между запусками: закрываем его по CONN_MAX_AGE
+            # или если оно стало непригодным, следующий запуск откроет новое
+            close_old_connections()
+            time.sleep(options['interval'])
+            close_old_connections()
+
+    def run_once(self, reservation_ttl_days, dry_run=False):
+        today = business_date()
+        overdue = RentalApplication.objects.filter(
+            status=RentalApplication.STATUS_ACTIVE, rental_end_date__lt=today
+        )
+        stale = RentalApplication.objects.filter(
+            status=RentalApplication.STATUS_RESERVED,
+            rental_start_date__lte=today - timedelta(days=reservation_ttl_days),
+        )
+
+        if dry_run:
+            self.stdout.write(
+                f"Будут просрочены: {self._ids(overdue.values_list('pk', flat=True))}, "
+                f"отменены резервы: {self._ids(stale.values_list('pk', flat=True))}"
+            )
+            return
+
+        # Все изменения — несколько UPDATE по условию, без загрузки заявок и save() на каждую.
+        # id выбираются заранее: по ним меняются строки и пишется журнал изменений
+        with transaction.atomic():
+            overdue_ids = list(overdue.select_for_update().values_list('pk', flat=True))
+            stale_ids = list(stale.select_for_update().values_list('pk', flat=True))
+            overdue = RentalApplication.objects.filter(pk__in=overdue_ids)
+            stale = RentalApplication.objects.filter(pk__in=stale_ids)
+
+            cities = set()
+            for applications in (overdue, stale):
+                for city, transport_city in applications.order_by().values_list('city', 'transport__city').distinct():
+                    cities.update((city, transport_city))
+
+            TransportDayOccupancy.objects.filter(application__in=overdue).update(
+                status=RentalApplication.STATUS_OVERDUE
+            )
+            overdue.update(status=RentalApplication.STATUS_OVERDUE, updated_at=timezone.now())
+
+            # Дни отмененной заявки остаются в истории занятости, но транспорт больше не занимают
+            TransportDayOccupancy.objects.filter(application__in=stale).update(
+                status=RentalApplication.STATUS_CANCELLED
+            )
+            stale.update(status=RentalApplication.STATUS_CANCELLED, updated_at=timezone.now())
+
+            if overdue_ids or stale_ids:
+                bump_version(*cities)
+
+        if overdue_ids:
+            logger.info("Аренды переведены в статус «Просрочена»: %s", self._ids(overdue_ids))
+        if stale_ids:
+            logger.warning(
+                "Резервы отменены через %s сут. после даты начала: %s", reservation_ttl_days, self._ids(stale_ids)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Просрочено аренд: {len(overdue_ids)} {self._ids(overdue_ids)}, "
+            f"отменено резервов: {len(stale_ids)} {self._ids(stale_ids)}"
+        ))
+
+    @staticmethod
+    def _ids(ids):
+        return '[' + ', '.join(map(str, ids)) + ']'
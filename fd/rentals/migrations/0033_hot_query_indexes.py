@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0032_delete_advantages_delete_blog_delete_review_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendar',
+            index=models.Index(fields=['city', 'start'], name='calendar_city_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendar',
+            index=models.Index(fields=['city', 'end'], name='calendar_city_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_at'], name='client_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['transport', 'status', 'rental_start_date', 'rental_end_date'], name='rental_availability_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['city', 'created_at'], name='rental_city_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['status', 'rental_end_date'], name='rental_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:09
+
+import sys
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def fill_occupancy(apps, schema_editor):
+    RentalApplication = apps.get_model('rentals', 'RentalApplication')
+    TransportDayOccupancy = apps.get_model('rentals', 'TransportDayOccupancy')
+
+    # Заполняем занятость по дням для заявок, которые занимают транспорт. Если день уже занят
+    # более ранней заявкой, он остается за ней, а пересечение выводится, как в rebuild_occupancy
+    occupied = {}
+    conflicts = []
+    rows = []
+    applications = RentalApplication.objects.exclude(status__in=['cancelled', 'completed']).order_by(
+        'rental_start_date', 'id'
+    ).values_list('id', 'transport_id', 'rental_start_date', 'rental_end_date', 'status')
+    for application_id, transport_id, start_date, end_date, status in applications.iterator():
+        for offset in range((end_date - start_date).days + 1):
+            day = start_date + timedelta(days=offset)
+            owner = occupied.get((transport_id, day))
+            if owner is not None:
+                if not conflicts or conflicts[-1][:2] != (application_id, owner):
+                    conflicts.append((application_id, owner, day))
+                continue
+            occupied[(transport_id, day)] = application_id
+            rows.append(TransportDayOccupancy(
+                transport_id=transport_id,
+                day=day,
+                application_id=application_id,
+                status=status,
+            ))
+        if len(rows) >= 1000:
+            TransportDayOccupancy.objects.bulk_create(rows)
+            rows = []
+    TransportDayOccupancy.objects.bulk_create(rows)
+
+    for application_id, owner, day in conflicts:
+        sys.stdout.write(
+            f"\n  Заявка {application_id} пересекается с заявкой {owner} начиная с {day.strftime('%d.%m.%Y')}: "
+            f"дни пересечения остаются за заявкой {owner}, исправьте даты одной из заявок"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0034_availabilityversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransportDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('status', models.CharField(choices=[('reserved', 'Резерв'), ('active', 'Активная'), ('completed', 'Завершенная'), ('cancelled', 'Отмененная'), ('overdue', 'Просрочена')], max_length=20, verbose_name='Статус')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupied_days', to='rentals.rentalapplication', verbose_name='Заявка на аренду')),
+                ('transport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_occupancy', to='rentals.transport', verbose_name='Транспорт')),
+            ],
+            options={
+                'verbose_name': 'День занятости транспорта',
+                'verbose_name_plural': 'Дни занятости транспорта',
+                'constraints': [models.UniqueConstraint(fields=('transport', 'day'), name='occupancy_transport_day_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_occupancy, migrations.RunPython.noop),
+    ]
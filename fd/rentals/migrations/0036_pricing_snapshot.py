@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0035_transportdayoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentalapplication',
+            name='daily_rate',
+            field=models.DecimalField(blank=True, decimal_places=0, editable=False, max_digits=10, null=True, verbose_name='Цена за сутки'),
+        ),
+        migrations.AddField(
+            model_name='rentalapplication',
+            name='rate_tier',
+            field=models.CharField(blank=True, choices=[('base', 'Базовый тариф'), ('3_6', 'Тариф 3-6 дней'), ('7_30', 'Тариф 7-30 дней'), ('30_plus', 'Тариф от 30 дней')], editable=False, max_length=10, null=True, verbose_name='Тариф'),
+        ),
+        migrations.AddField(
+            model_name='rentalapplication',
+            name='rental_days',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Количество суток'),
+        ),
+        migrations.AddField(
+            model_name='rentalapplication',
+            name='total_cost',
+            field=models.DecimalField(blank=True, decimal_places=0, editable=False, max_digits=10, null=True, verbose_name='Стоимость аренды'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0036_pricing_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransportTariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valid_from', models.DateField(help_text='Тариф применяется к арендам, начинающимся с этой даты', verbose_name='Действует с')),
+                ('price_per_day', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена за сутки')),
+                ('price_3_6_days', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена за 3-6 суток (за сутки)')),
+                ('price_7_30_days', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена за 7-30 суток (за сутки)')),
+                ('price_30_plus_days', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена от 30 суток (за сутки)')),
+                ('transport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tariffs', to='rentals.transport', verbose_name='Транспорт')),
+            ],
+            options={
+                'verbose_name': 'Тариф транспорта',
+                'verbose_name_plural': 'Тарифы транспорта',
+                'ordering': ['transport', '-valid_from'],
+                'constraints': [models.UniqueConstraint(fields=('transport', 'valid_from'), name='tariff_transport_valid_from_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0037_transporttariff'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendar',
+            index=models.Index(fields=['start', 'id'], name='calendar_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['created_at', 'id'], name='rental_created_id_idx'),
+        ),
+    ]
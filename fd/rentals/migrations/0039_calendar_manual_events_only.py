@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:25
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def delete_rental_events(apps, schema_editor):
+    # События аренды теперь строятся из заявок; в календаре остаются только ручные события
+    Calendar = apps.get_model('rentals', 'Calendar')
+    Calendar.objects.filter(rental_application__isnull=False).delete()
+
+
+def restore_rental_events(apps, schema_editor):
+    RentalApplication = apps.get_model('rentals', 'RentalApplication')
+    Calendar = apps.get_model('rentals', 'Calendar')
+    events = (
+        Calendar(
+            rental_application_id=rental.pk,
+            transport_id=rental.transport_id,
+            title=f"Аренда: {rental.full_name}",
+            start=timezone.make_aware(datetime.combine(rental.rental_start_date, datetime.min.time())),
+            end=timezone.make_aware(datetime.combine(rental.rental_end_date, datetime.max.time())),
+            status=rental.status,
+            city=rental.city,
+        )
+        for rental in RentalApplication.objects.iterator()
+    )
+    Calendar.objects.bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0038_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_rental_events, restore_rental_events),
+        migrations.RemoveField(
+            model_name='calendar',
+            name='rental_application',
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['city', 'rental_start_date'], name='rental_city_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['city', 'rental_end_date'], name='rental_city_end_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0039_calendar_manual_events_only'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='calendar',
+            name='calendar_city_start_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='rentalapplication',
+            name='rental_city_start_idx',
+        ),
+        migrations.AddIndex(
+            model_name='calendar',
+            index=models.Index(fields=['city', 'start', 'end'], name='calendar_city_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalapplication',
+            index=models.Index(fields=['city', 'rental_start_date', 'rental_end_date'], name='rental_city_window_idx'),
+        ),
+    ]
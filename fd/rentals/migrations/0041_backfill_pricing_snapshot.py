@@ -0,0 +1,88 @@
+from bisect import bisect_right
+
+from django.db import migrations
+
+# Копия правил rentals.pricing на момент миграции: последующие изменения расчета
+# стоимости не должны менять то, что делает эта миграция
+TIER_PRICE_FIELDS = {
+    'base': 'price_per_day',
+    '3_6': 'price_3_6_days',
+    '7_30': 'price_7_30_days',
+    '30_plus': 'price_30_plus_days',
+}
+TIER_MAX_DAYS = (
+    ('base', 2),
+    ('3_6', 6),
+    ('7_30', 29),
+)
+
+
+def rate_tier_for_days(days):
+    for tier, max_days in TIER_MAX_DAYS:
+        if days <= max_days:
+            return tier
+    return '30_plus'
+
+
+def total_cost_for(daily_rate, days, discount):
+    return daily_rate * days * (100 - discount) // 100
+
+
+def fill_pricing_snapshot(apps, schema_editor):
+    RentalApplication = apps.get_model('rentals', 'RentalApplication')
+    Transport = apps.get_model('rentals', 'Transport')
+    TransportTariff = apps.get_model('rentals', 'TransportTariff')
+
+    price_fields = list(TIER_PRICE_FIELDS.values())
+    transport_prices = {
+        row[0]: dict(zip(TIER_PRICE_FIELDS, row[1:]))
+        for row in Transport.objects.values_list('id', *price_fields)
+    }
+    # Тарифы транспорта по возрастанию даты начала действия
+    tariffs = {}
+    for row in TransportTariff.objects.order_by('transport_id', 'valid_from').values_list(
+        'transport_id', 'valid_from', *price_fields
+    ):
+        dates, prices = tariffs.setdefault(row[0], ([], []))
+        dates.append(row[1])
+        prices.append(dict(zip(TIER_PRICE_FIELDS, row[2:])))
+
+    def prices_on(transport_id, on_date):
+        dates, prices = tariffs.get(transport_id, ((), ()))
+        index = bisect_right(dates, on_date)
+        if index:
+            return prices[index - 1]
+        return transport_prices.get(transport_id)
+
+    # Снимок стоимости по тарифу на дату начала аренды — как при сохранении заявки
+    snapshots = []
+    applications = RentalApplication.objects.filter(total_cost__isnull=True).values_list(
+        'id', 'transport_id', 'rental_start_date', 'rental_end_date', 'discount'
+    )
+    for application_id, transport_id, start_date, end_date, discount in applications.iterator():
+        days = max((end_date - start_date).days, 0) if start_date and end_date else 0
+        tier = rate_tier_for_days(days)
+        prices = prices_on(transport_id, start_date) if transport_id else None
+        daily_rate = int(prices[tier]) if prices and days > 0 else 0
+        snapshots.append(RentalApplication(
+            id=application_id,
+            rental_days=days,
+            rate_tier=tier,
+            daily_rate=daily_rate,
+            total_cost=total_cost_for(daily_rate, days, discount),
+        ))
+        if len(snapshots) >= 1000:
+            RentalApplication.objects.bulk_update(snapshots, ['rental_days', 'rate_tier', 'daily_rate', 'total_cost'])
+            snapshots = []
+    RentalApplication.objects.bulk_update(snapshots, ['rental_days', 'rate_tier', 'daily_rate', 'total_cost'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0040_calendar_window_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_pricing_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:59
+
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def fill_inactive_occupancy(apps, schema_editor):
+    RentalApplication = apps.get_model('rentals', 'RentalApplication')
+    TransportDayOccupancy = apps.get_model('rentals', 'TransportDayOccupancy')
+
+    # Дни завершенных и отмененных заявок раньше не хранились — дописываем их в историю
+    rows = []
+    applications = RentalApplication.objects.filter(status__in=['cancelled', 'completed']).values_list(
+        'id', 'transport_id', 'rental_start_date', 'rental_end_date', 'status'
+    )
+    for application_id, transport_id, start_date, end_date, status in applications.iterator():
+        for offset in range((end_date - start_date).days + 1):
+            rows.append(TransportDayOccupancy(
+                transport_id=transport_id,
+                day=start_date + timedelta(days=offset),
+                application_id=application_id,
+                status=status,
+            ))
+        if len(rows) >= 1000:
+            TransportDayOccupancy.objects.bulk_create(rows)
+            rows = []
+    TransportDayOccupancy.objects.bulk_create(rows)
+
+
+def drop_inactive_occupancy(apps, schema_editor):
+    TransportDayOccupancy = apps.get_model('rentals', 'TransportDayOccupancy')
+    TransportDayOccupancy.objects.filter(status__in=['cancelled', 'completed']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0041_backfill_pricing_snapshot'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='transportdayoccupancy',
+            name='occupancy_transport_day_uniq',
+        ),
+        migrations.AddIndex(
+            model_name='transportdayoccupancy',
+            index=models.Index(fields=['transport', 'day'], name='occupancy_transport_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='transportdayoccupancy',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('reserved', 'active', 'overdue'))), fields=('transport', 'day'), name='occupancy_transport_day_uniq'),
+        ),
+        migrations.RunPython(fill_inactive_occupancy, drop_inactive_occupancy),
+    ]
@@ -1,11 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from phonenumber_field.modelfields import PhoneNumberField
-from datetime import datetime
+from zoneinfo import ZoneInfo
 from django.core.exceptions import ValidationError
 from django.db.models import Q
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
 from slugify import slugify as slugify_translit
+from . import pricing
 
 # Варианты для поля "Откуда о нас узнали"
 HOW_DID_YOU_FIND_US_CHOICES = [
@@ -36,6 +38,15 @@ CONDITION_CHOICES = [
     ('poor', 'Плохое'),
 ]
 
+# Рабочая дата (просрочка и т.п.) определяется по московскому времени, независимо от сервера
+BUSINESS_TIME_ZONE = ZoneInfo('Europe/Moscow')
+
+
+def business_date():
+    """Текущая дата по московскому времени"""
+    return timezone.localdate(timezone=BUSINESS_TIME_ZONE)
+
+
 class Client(models.Model):
     full_name = models.CharField('ФИО', max_length=200)
     phone_number = PhoneNumberField('Телефон', unique=True)
@@ -61,6 +72,10 @@ class Client(models.Model):
         verbose_name = "Клиент"
         verbose_name_plural = "Клиенты"
         ordering = ['phone_number']
+        indexes = [
+            # Аналитика новых клиентов по месяцам
+            models.Index(fields=['created_at'], name='client_created_at_idx'),
+        ]
 
 class Transport(models.Model):
     number = models.PositiveIntegerField('Номер', help_text="Порядковый номер транспорта", null=True, blank=True)
@@ -101,9 +116,14 @@ class Transport(models.Model):
         return slug
     
     def save(self, *args, **kwargs):
+        from .availability_cache import bump_version
+
         if not self.slug:
             self.slug = self._generate_unique_slug()
         super().save(*args, **kwargs)
+        # Транспорт мог сменить город или данные для списка, сбрасываем кэш всех городов
+        bump_version()
+        pricing.invalidate_tariff_table()
     
     def check_availability(self, start_date, end_date, exclude_booking_id=None):
         """
@@ -117,20 +137,12 @@ class Transport(models.Model):
         Returns:
             tuple: (bool, str) - (доступен ли, сообщение о причине недоступности)
         """
-        # Проверяем пересечение с существующими бронями
-        overlapping_bookings = self.rental_applications.filter(
-            Q(rental_start_date__lte=end_date) & 
-            Q(rental_end_date__gte=start_date) &
-            ~Q(status__in=[RentalApplication.STATUS_CANCELLED, RentalApplication.STATUS_COMPLETED])  # Исключаем отмененные и завершенные заявки
-        )
-        
-        # Исключаем текущую бронь при редактировании
-        if exclude_booking_id:
-            overlapping_bookings = overlapping_bookings.exclude(id=exclude_booking_id)
-        
-        if overlapping_bookings.exists():
-            booking = overlapping_bookings.first()
-            return False, f"Транспорт забронирован с {booking.rental_start_date.strftime('%d.%m.%Y')} по {booking.rental_end_date.strftime('%d.%m.%Y')}"
+        from .availability import find_conflict
+
+        # Проверяем пересечение с существующими бронями (текущая бронь исключается при редактировании)
+        booking = find_conflict(self.pk, start_date, end_date, exclude_booking_id=exclude_booking_id)
+        if booking:
+            return False, f"Транспорт забронирован с {booking['rental_start_date'].strftime('%d.%m.%Y')} по {booking['rental_end_date'].strftime('%d.%m.%Y')}"
             
         return True, "Транспорт доступен в указанные даты"
     
@@ -141,6 +153,101 @@ class Transport(models.Model):
         verbose_name = "Транспорт"
         verbose_name_plural = "Транспорт"
 
+
+class TransportTariff(models.Model):
+    """Цены транспорта, действующие с даты valid_from до начала следующего тарифа"""
+    transport = models.ForeignKey(Transport, on_delete=models.CASCADE, related_name='tariffs', verbose_name='Транспорт')
+    valid_from = models.DateField('Действует с', help_text="Тариф применяется к арендам, начинающимся с этой даты")
+    price_per_day = models.DecimalField('Цена за сутки', max_digits=10, decimal_places=2, default=0)
+    price_3_6_days = models.DecimalField('Цена за 3-6 суток (за сутки)', max_digits=10, decimal_places=2, default=0)
+    price_7_30_days = models.DecimalField('Цена за 7-30 суток (за сутки)', max_digits=10, decimal_places=2, default=0)
+    price_30_plus_days = models.DecimalField('Цена от 30 суток (за сутки)', max_digits=10, decimal_places=2, default=0)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._tariffs_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._tariffs_changed()
+        return result
+
+    def _tariffs_changed(self):
+        from .availability_cache import bump_version
+
+        # Цены в списке свободного транспорта кэшируются вместе с доступностью
+        bump_version(self.transport.city)
+        pricing.invalidate_tariff_table()
+
+    def __str__(self):
+        return f"{self.transport} с {self.valid_from.strftime('%d.%m.%Y')}"
+
+    class Meta:
+        verbose_name = "Тариф транспорта"
+        verbose_name_plural = "Тарифы транспорта"
+        ordering = ['transport', '-valid_from']
+        constraints = [
+            models.UniqueConstraint(fields=['transport', 'valid_from'], name='tariff_transport_valid_from_uniq'),
+        ]
+
+class RentalApplicationQuerySet(models.QuerySet):
+    @staticmethod
+    def overdue_condition(today=None):
+        """
+        Заявка просрочена, если у нее статус «Просрочена» или она активна, а дата окончания
+        раньше текущей московской даты. Условие использует индекс (status, rental_end_date).
+        """
+        return (
+            Q(status=RentalApplication.STATUS_OVERDUE) |
+            Q(status=RentalApplication.STATUS_ACTIVE, rental_end_date__lt=today or business_date())
+        )
+
+    def overdue(self):
+        return self.filter(self.overdue_condition())
+
+    def not_overdue(self):
+        return self.exclude(self.overdue_condition())
+
+    def with_effective_status(self):
+        """Добавляет effective_status: статус, который видит пользователь (просроченные активные — overdue)"""
+        return self.annotate(effective_status=models.Case(
+            models.When(self.overdue_condition(), then=models.Value(RentalApplication.STATUS_OVERDUE)),
+            default=models.F('status'),
+            output_field=models.CharField(),
+        ))
+
+    def with_status_rank(self):
+        """
+        Добавляет status_rank для сортировки по срочности: просроченные первыми,
+        затем активные, резерв, завершенные и отмененные
+        """
+        statuses = (
+            RentalApplication.STATUS_ACTIVE, RentalApplication.STATUS_RESERVED,
+            RentalApplication.STATUS_COMPLETED, RentalApplication.STATUS_CANCELLED,
+        )
+        ranks = [models.When(status=status, then=models.Value(rank)) for rank, status in enumerate(statuses, start=1)]
+        return self.annotate(status_rank=models.Case(
+            models.When(self.overdue_condition(), then=models.Value(0)),
+            *ranks,
+            default=models.Value(len(ranks) + 1),
+            output_field=models.IntegerField(),
+        ))
+
+    def with_pricing(self):
+        """
+        Добавляет live_rental_days, live_rate_tier, live_daily_rate, live_discount_amount и live_total_cost,
+        посчитанные в SQL по текущим ценам транспорта (в отличие от сохраненного снимка стоимости)
+        """
+        queryset = self
+        for annotations in pricing.pricing_annotations():
+            queryset = queryset.annotate(**annotations)
+        return queryset
+
+    def with_discount_amount(self):
+        """Добавляет discount_amount — сумму скидки по сохраненному снимку стоимости, для сортировки"""
+        return self.annotate(discount_amount=pricing.snapshot_discount_amount())
+
+
 class RentalApplication(models.Model):
     # Статусы заявки
     STATUS_RESERVED = 'reserved'
@@ -157,6 +264,11 @@ class RentalApplication(models.Model):
         (STATUS_OVERDUE, 'Просрочена'),
     ]
 
+    # Заявки в этих статусах не занимают транспорт
+    INACTIVE_STATUSES = (STATUS_CANCELLED, STATUS_COMPLETED)
+    # Заявки в этих статусах занимают транспорт
+    OCCUPYING_STATUSES = (STATUS_RESERVED, STATUS_ACTIVE, STATUS_OVERDUE)
+
     DISCOUNT_CHOICES = [
         (0, 'Без скидки'),
         (10, '10%'),
@@ -203,6 +315,88 @@ class RentalApplication(models.Model):
         related_name='created_rental_applications'
     )
     activated_at = models.DateTimeField(null=True, blank=True, verbose_name="Время активации")
+
+    # Снимок стоимости на момент сохранения: пересчитывается только при изменении дат, транспорта или скидки
+    rental_days = models.PositiveIntegerField('Количество суток', null=True, blank=True, editable=False)
+    rate_tier = models.CharField('Тариф', max_length=10, choices=pricing.RATE_TIER_CHOICES, null=True, blank=True, editable=False)
+    daily_rate = models.DecimalField('Цена за сутки', max_digits=10, decimal_places=0, null=True, blank=True, editable=False)
+    total_cost = models.DecimalField('Стоимость аренды', max_digits=10, decimal_places=0, null=True, blank=True, editable=False)
+
+    objects = RentalApplicationQuerySet.as_manager()
+
+    # Поля, от которых зависит снимок стоимости
+    PRICING_INPUT_FIELDS = ('transport_id', 'rental_start_date', 'rental_end_date', 'discount')
+    PRICING_FIELDS = ('rental_days', 'rate_tier', 'daily_rate', 'total_cost')
+
+    # Поля, от которых зависят связанные данные: если они не менялись, соответствующий шаг
+    # сохранения (синхронизация клиента, проверка доступности) пропускается
+    CLIENT_FIELDS = (
+        'client_id', 'full_name', 'phone_number', 'passport_number', 'passport_issued_by',
+        'passport_issue_date', 'how_did_you_find_us',
+    )
+    AVAILABILITY_FIELDS = ('transport_id', 'rental_start_date', 'rental_end_date', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Перечитанные значения совпадают с базой: запоминаем их, чтобы они не считались изменениями
+        self._remember_state(fields)
+
+    def _remember_state(self, update_fields=None):
+        """Запоминает значения полей, как они записаны в базе (после частичного сохранения — только update_fields)"""
+        deferred = self.get_deferred_fields()
+        state = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+        if update_fields is not None and getattr(self, '_loaded_state', None) is not None:
+            saved = {self._meta.get_field(name).attname for name in update_fields}
+            state = dict(self._loaded_state, **{name: value for name, value in state.items() if name in saved})
+        self._loaded_state = state
+
+    def get_changed_fields(self):
+        """Поля (attname), измененные с момента загрузки или сохранения; None для новой заявки"""
+        loaded = getattr(self, '_loaded_state', None)
+        if loaded is None or self._state.adding:
+            return None
+        changed = set()
+        for field in self._meta.concrete_fields:
+            name = field.attname
+            if name in loaded:
+                if getattr(self, name) != loaded[name]:
+                    changed.add(name)
+            elif name in self.__dict__:
+                # Поле было отложено при загрузке и с тех пор получено или присвоено
+                changed.add(name)
+        return changed
+
+    def has_changed(self, *names):
+        """Изменилось ли хотя бы одно из полей с момента загрузки; для новой заявки — да"""
+        loaded = getattr(self, '_loaded_state', None)
+        if loaded is None or self._state.adding:
+            return True
+        return any(name in loaded and getattr(self, name) != loaded[name] for name in names)
+
+    def has_pricing_snapshot(self):
+        """Снимок стоимости сохранен и посчитан для текущих дат, транспорта и скидки"""
+        if 'total_cost' in self.get_deferred_fields() or self.total_cost is None:
+            return False
+        return not self.has_changed(*self.PRICING_INPUT_FIELDS)
+
+    def refresh_pricing(self):
+        """Пересчитывает снимок стоимости по тарифу, действующему на дату начала аренды"""
+        days = max(self._live_rental_days(), 0)
+        daily_rate = pricing.daily_rate_for(self.transport if self.transport_id else None, days, self.rental_start_date)
+        self.rental_days = days
+        self.rate_tier = pricing.rate_tier_for_days(days)
+        self.daily_rate = daily_rate
+        self.total_cost = pricing.total_cost_for(daily_rate, days, self.discount)
   
     def clean(self):
         """Валидация заявки на аренду"""
@@ -218,8 +412,9 @@ class RentalApplication(models.Model):
             #         'rental_start_date': 'Дата начала аренды не может быть в прошлом'
             #     })
             
-            # Проверка доступности транспорта только если он выбран
-            if hasattr(self, 'transport_id') and self.transport_id:
+            # Проверка доступности транспорта только если он выбран и изменились транспорт, даты
+            # или статус: при правке залога или контактов запрос пересечений не нужен
+            if self.transport_id and self.has_changed(*self.AVAILABILITY_FIELDS):
                 is_available, message = self.transport.check_availability(
                     self.rental_start_date,
                     self.rental_end_date,
@@ -231,6 +426,92 @@ class RentalApplication(models.Model):
                     })
     
     def save(self, *args, **kwargs):
+        from .availability import lock_transport, sync_application_occupancy
+
+        if self._clear_stale_overdue() and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'status'}
+
+        changed = self.get_changed_fields()
+        previous_cities = self._previous_cities(changed)
+        if changed is not None and not changed.intersection(self.AVAILABILITY_FIELDS):
+            # Занятость транспорта не меняется: без блокировки и проверки; кэш сбрасываем,
+            # только если заявка перешла в другой город
+            self._save_application(changed, *args, **kwargs)
+            if previous_cities:
+                self._bump_availability_version(previous_cities)
+            return
+
+        # Проверка доступности и запись выполняются в одной транзакции под блокировкой
+        # транспорта, поэтому параллельные брони одной машины не проходят обе
+        with transaction.atomic():
+            if self.transport_id:
+                lock_transport(self.transport_id)
+            self._save_application(changed, *args, **kwargs)
+            sync_application_occupancy(self)
+            self._bump_availability_version(previous_cities)
+
+    def _clear_stale_overdue(self):
+        """
+        Возвращает просроченную аренду в «Активная», если дату окончания продлили
+        до сегодняшнего дня (по Москве) или позже. True, если статус изменен.
+        """
+        if (
+            self.status == self.STATUS_OVERDUE and self.rental_end_date
+            and self.rental_end_date >= business_date()
+        ):
+            self.status = self.STATUS_ACTIVE
+            return True
+        return False
+
+    def _previous_cities(self, changed):
+        """Прежний город заявки и город прежнего транспорта, если заявку перенесли"""
+        if not changed:
+            return set()
+        cities = set()
+        if 'city' in changed:
+            cities.add(self._loaded_state.get('city'))
+        previous_transport_id = self._loaded_state.get('transport_id')
+        if 'transport_id' in changed and previous_transport_id:
+            cities.update(Transport.objects.filter(pk=previous_transport_id).values_list('city', flat=True))
+        cities.discard(None)
+        return cities
+
+    def _bump_availability_version(self, previous_cities=()):
+        """Сбрасывает кэш доступности для города заявки и города транспорта, включая прежние"""
+        from .availability_cache import bump_version
+
+        cities = {self.city, *previous_cities}
+        if self.transport_id:
+            cities.add(self.transport.city)
+        bump_version(*cities)
+
+    def _save_application(self, changed, *args, **kwargs):
+        """changed — измененные поля существующей заявки или None для новой"""
+        if changed is None or changed.intersection(self.CLIENT_FIELDS):
+            self._sync_client()
+
+        self.clean()
+
+        update_fields = kwargs.get('update_fields')
+        if not self.has_pricing_snapshot():
+            self.refresh_pricing()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.PRICING_FIELDS)
+        
+        # Сохраняем исходную сумму аренды при первом переводе в статус Активная
+        if self.status == self.STATUS_ACTIVE and not self.original_total_cost:
+            self.original_total_cost = self.calculate_total_cost()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'original_total_cost'}
+
+        if changed is not None and update_fields is None and not kwargs.get('force_insert'):
+            # Пишем только измененные поля, включая заполненные выше клиента и снимок стоимости
+            kwargs['update_fields'] = self.get_changed_fields() | {'updated_at'}
+
+        super().save(*args, **kwargs)
+        self._remember_state(kwargs.get('update_fields'))
+
+    def _sync_client(self):
         # Создаем или находим клиента при сохранении заявки
         if not self.client:
             client, created = Client.objects.get_or_create(
@@ -269,95 +550,44 @@ class RentalApplication(models.Model):
             # Сохраняем клиента, если были изменения
             if updated:
                 self.client.save()
-        
-        self.clean()
-        
-        # Сохраняем исходную сумму аренды при первом переводе в статус Активная
-        if self.status == self.STATUS_ACTIVE and not self.original_total_cost:
-            self.original_total_cost = self.calculate_total_cost()
-        
-        # Создаем или обновляем событие в календаре
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        # Создаем или обновляем событие в календаре
-        calendar_event, created = Calendar.objects.get_or_create(
-            rental_application=self,
-            defaults={
-                'transport': self.transport,
-                'title': f"Аренда: {self.full_name}",
-                'start': datetime.combine(self.rental_start_date, datetime.min.time()),
-                'end': datetime.combine(self.rental_end_date, datetime.max.time()),
-                'status': self.status,
-                'city': self.city
-            }
-        )
-        
-        if not created:
-            calendar_event.transport = self.transport
-            calendar_event.title = f"Аренда: {self.full_name}"
-            calendar_event.start = datetime.combine(self.rental_start_date, datetime.min.time())
-            calendar_event.end = datetime.combine(self.rental_end_date, datetime.max.time())
-            calendar_event.status = self.status
-            calendar_event.city = self.city
-            calendar_event.save()
 
     def delete(self, *args, **kwargs):
-        # Удаляем связанное событие календаря при удалении заявки
-        Calendar.objects.filter(rental_application=self).delete()
         super().delete(*args, **kwargs)
+        self._bump_availability_version()
     
-    def get_rental_days(self):
-        """Вычисляет количество дней аренды"""
+    def _live_rental_days(self):
         if not self.rental_start_date or not self.rental_end_date:
             return 0
         delta = self.rental_end_date - self.rental_start_date
         return delta.days  # Убираем +1, так как нам нужны только полные сутки
+
+    def get_rental_days(self):
+        """Вычисляет количество дней аренды"""
+        if self.has_pricing_snapshot():
+            return self.rental_days
+        return self._live_rental_days()
     
     def get_daily_rate(self):
         """Определяет тариф за сутки в зависимости от длительности аренды"""
-        days = self.get_rental_days()
-        if not self.transport or days <= 0:
-            return 0
-        if days <= 2:
-            return int(self.transport.price_per_day)
-        elif 3 <= days <= 6:
-            return int(self.transport.price_3_6_days)
-        elif 7 <= days <= 29:
-            return int(self.transport.price_7_30_days)
-        else:  # 30 и более дней
-            return int(self.transport.price_30_plus_days)
+        if self.has_pricing_snapshot():
+            return int(self.daily_rate)
+        return pricing.daily_rate_for(self.transport, self.get_rental_days(), self.rental_start_date)
     
     def calculate_total_cost(self):
         """Вычисляет общую стоимость аренды с учетом скидки"""
-        daily_rate = self.get_daily_rate()
-        days = self.get_rental_days()
-        if daily_rate == 0 or days == 0:
-            return 0
-        base_cost = int(daily_rate * days)
-        discount_amount = base_cost * (self.discount / 100)
-        return int(base_cost - discount_amount)
+        if self.has_pricing_snapshot():
+            return int(self.total_cost)
+        return pricing.total_cost_for(self.get_daily_rate(), self.get_rental_days(), self.discount)
     
     def get_discount_amount(self):
         """Возвращает сумму скидки"""
-        daily_rate = self.get_daily_rate()
-        days = self.get_rental_days()
-        if daily_rate == 0 or days == 0:
-            return 0
-        base_cost = int(daily_rate * days)
-        return int(base_cost * (self.discount / 100))
+        return pricing.discount_amount_for(self.get_daily_rate(), self.get_rental_days(), self.discount)
     
     def get_rate_type(self):
         """Возвращает тип примененного тарифа"""
-        days = self.get_rental_days()
-        if days <= 2:
-            return "Базовый тариф"
-        elif 3 <= days <= 6:
-            return "Тариф 3-6 дней"
-        elif 7 <= days <= 29:
-            return "Тариф 7-30 дней"
-        else:
-            return "Тариф от 30 дней"
+        if self.has_pricing_snapshot():
+            return pricing.RATE_TIER_LABELS[self.rate_tier]
+        return pricing.RATE_TIER_LABELS[pricing.rate_tier_for_days(self.get_rental_days())]
     
     def get_status_display_class(self):
         """Возвращает CSS класс для отображения статуса"""
@@ -366,6 +596,7 @@ class RentalApplication(models.Model):
             self.STATUS_ACTIVE: 'status-active',
             self.STATUS_COMPLETED: 'status-completed',
             self.STATUS_CANCELLED: 'status-cancelled',
+            self.STATUS_OVERDUE: 'status-overdue',
         }
         return status_classes.get(self.status, '')
 
@@ -374,7 +605,9 @@ class RentalApplication(models.Model):
         # Словарь допустимых переходов статуса
         allowed_transitions = {
             self.STATUS_RESERVED: [self.STATUS_ACTIVE, self.STATUS_CANCELLED],
-            self.STATUS_ACTIVE: [self.STATUS_COMPLETED, self.STATUS_CANCELLED],
+            self.STATUS_ACTIVE: [self.STATUS_COMPLETED, self.STATUS_CANCELLED, self.STATUS_OVERDUE],
+            # Просроченную аренду можно завершить или, после продления, вернуть в активные
+            self.STATUS_OVERDUE: [self.STATUS_COMPLETED, self.STATUS_ACTIVE],
             self.STATUS_COMPLETED: [],  # Завершенную заявку нельзя изменить
             self.STATUS_CANCELLED: [],  # Отмененную заявку нельзя изменить
         }
@@ -395,6 +628,22 @@ class RentalApplication(models.Model):
         verbose_name = "Заявка на аренду"
         verbose_name_plural = "Заявки на аренду"
         ordering = ['-created_at'] 
+        indexes = [
+            # Проверка доступности: пересечение броней конкретного транспорта
+            models.Index(
+                fields=['transport', 'status', 'rental_start_date', 'rental_end_date'],
+                name='rental_availability_idx',
+            ),
+            # Список заявок и аналитика в разрезе города
+            models.Index(fields=['city', 'created_at'], name='rental_city_created_idx'),
+            # Поиск просроченных аренд
+            models.Index(fields=['status', 'rental_end_date'], name='rental_status_end_idx'),
+            # Лента календаря выдачи (пересечение с окном) и календаря возвратов по городу
+            models.Index(fields=['city', 'rental_start_date', 'rental_end_date'], name='rental_city_window_idx'),
+            models.Index(fields=['city', 'rental_end_date'], name='rental_city_end_idx'),
+            # Постраничный вывод списка заявок по ключу (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='rental_created_id_idx'),
+        ]
 
     def complete_early(self, new_end_date=None):
         """Досрочно завершить аренду, пересчитать сумму и сменить статус на Завершенная. new_end_date — дата возврата (по умолчанию сегодня)."""
@@ -412,19 +661,20 @@ class RentalApplication(models.Model):
 
     @property
     def is_overdue(self):
-        from django.utils import timezone
-        import pytz
-        from datetime import timedelta
-        if self.status == self.STATUS_ACTIVE and self.rental_end_date:
-            tz = pytz.timezone('Europe/Moscow')
-            # Просроченной считается с 00:00 следующего дня после rental_end_date
-            overdue_dt = datetime.combine(self.rental_end_date, datetime.min.time()) + timedelta(days=1)
-            overdue_dt = tz.localize(overdue_dt)
-            now = timezone.localtime(timezone.now(), tz)
-            return now >= overdue_dt
-        return False
+        # В списках значение приходит из аннотации with_effective_status
+        effective_status = getattr(self, 'effective_status', None)
+        if effective_status is not None:
+            return effective_status == self.STATUS_OVERDUE
+        if self.status == self.STATUS_OVERDUE:
+            return True
+        # Просроченной считается с 00:00 (МСК) следующего дня после rental_end_date
+        return (
+            self.status == self.STATUS_ACTIVE and bool(self.rental_end_date)
+            and self.rental_end_date < business_date()
+        )
 
 class Calendar(models.Model):
+    """Ручное событие календаря; события аренды строятся из заявок (см. calendar_feed)"""
     transport = models.ForeignKey(Transport, verbose_name='Транспорт', on_delete=models.CASCADE, related_name='calendar_events')
     title = models.CharField('Название события', max_length=200)
     start = models.DateTimeField('Начало')
@@ -436,23 +686,82 @@ class Calendar(models.Model):
         choices=RentalApplication.STATUS_CHOICES,
         default=RentalApplication.STATUS_RESERVED
     )
-    rental_application = models.ForeignKey(
-        RentalApplication,
-        verbose_name='Заявка на аренду',
-        on_delete=models.CASCADE,
-        related_name='calendar_events',
-        null=True,
-        blank=True
-    )
     city = models.CharField('Город', max_length=16, choices=CITY_CHOICES, default='sochi')
 
     def __str__(self):
         return f"{self.transport} - {self.title} ({self.start.date()} - {self.end.date()})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._events_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._events_changed()
+        return result
+
+    def _events_changed(self):
+        from .availability_cache import bump_version
+
+        # Версия данных служит валидатором (ETag) лент календаря; ручные события редки,
+        # поэтому сбрасываем все города, включая прежний город перенесенного события
+        bump_version()
+
     class Meta:
         verbose_name = "Событие календаря"
         verbose_name_plural = "События календаря"
         ordering = ['start'] 
+        indexes = [
+            # Лента календаря выдачи (пересечение с окном) и календаря возвратов по городу
+            models.Index(fields=['city', 'start', 'end'], name='calendar_city_window_idx'),
+            models.Index(fields=['city', 'end'], name='calendar_city_end_idx'),
+            # Постраничный вывод списка событий по ключу (start, id)
+            models.Index(fields=['start', 'id'], name='calendar_start_id_idx'),
+        ]
+
+class TransportDayOccupancy(models.Model):
+    """
+    Занятость транспорта по дням.
+
+    Материализуется из заявок при их сохранении: по одной строке на каждый день брони
+    с ее текущим статусом, включая завершенные и отмененные брони, чтобы отчеты по дням
+    считались GROUP BY по этой таблице. Уникальность (транспорт, день) среди строк
+    в статусах, занимающих транспорт, не дает записать две пересекающиеся брони.
+    """
+    transport = models.ForeignKey(Transport, verbose_name='Транспорт', on_delete=models.CASCADE, related_name='day_occupancy')
+    day = models.DateField('День')
+    application = models.ForeignKey(RentalApplication, verbose_name='Заявка на аренду', on_delete=models.CASCADE, related_name='occupied_days')
+    status = models.CharField('Статус', max_length=20, choices=RentalApplication.STATUS_CHOICES)
+
+    def __str__(self):
+        return f"{self.transport_id} - {self.day}"
+
+    class Meta:
+        verbose_name = "День занятости транспорта"
+        verbose_name_plural = "Дни занятости транспорта"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['transport', 'day'],
+                condition=Q(status__in=RentalApplication.OCCUPYING_STATUSES),
+                name='occupancy_transport_day_uniq',
+            ),
+        ]
+        indexes = [
+            # История занятости транспорта по дням, включая завершенные и отмененные брони
+            models.Index(fields=['transport', 'day'], name='occupancy_transport_day_idx'),
+        ]
+
+class AvailabilityVersion(models.Model):
+    """Счетчик версии данных о занятости транспорта в городе, по нему инвалидируется кэш доступности"""
+    city = models.CharField('Город', max_length=16, unique=True)
+    version = models.PositiveBigIntegerField('Версия', default=0)
+
+    def __str__(self):
+        return f"{self.city or 'все города'}: {self.version}"
+
+    class Meta:
+        verbose_name = "Версия доступности"
+        verbose_name_plural = "Версии доступности"
 
 from website.models import Advantages
 
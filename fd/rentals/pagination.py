@@ -0,0 +1,157 @@
+"""
+Постраничный вывод списков админки по ключу (keyset) вместо OFFSET.
+
+Следующая страница выбирается условием «строки после последней показанной» по упорядоченному
+набору полей (например, created_at и id), предыдущая — «строки перед первой показанной» в обратном
+порядке, поэтому дальние страницы открываются так же быстро, как первая. Вместо точного COUNT(*) показывается число строк, ограниченное COUNT_CAP.
+
+Включается атрибутом keyset_ordering у ModelAdmin с KeysetPaginationMixin. При ручной сортировке
+по колонке или «Показать все» используется обычная постраничная навигация Django.
+"""
+import base64
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+CURSOR_VAR = 'cursor'
+BEFORE_VAR = 'before'
+
+# Больше этого числа строк не считаем: в списке будет «более COUNT_CAP»
+COUNT_CAP = 1000
+
+
+def _cursor_value(value):
+    # isoformat без округления: DjangoJSONEncoder обрезает время до миллисекунд, и ключ перестает совпадать
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    payload = json.dumps(list(values), default=_cursor_value)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, model, ordering):
+    """Значения ключа из курсора, приведенные к типам полей; ValueError для испорченного курсора"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Некорректный курсор') from exc
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValueError('Некорректный курсор')
+    try:
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except ValidationError as exc:
+        raise ValueError('Некорректный курсор') from exc
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def seek_condition(ordering, values):
+    """
+    Условие «строка после ключа values» для сортировки ordering:
+    (a > x) OR (a = x AND b > y) ..., для полей с минусом — «меньше».
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+class KeysetChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        # Курсоры — не фильтры: убираем их из параметров, чтобы они не попадали в ссылки фильтров и поиска
+        for name in (CURSOR_VAR, BEFORE_VAR):
+            self.params.pop(name, None)
+            self.filter_params.pop(name, None)
+        self.cursor = request.GET.get(CURSOR_VAR) or None
+        self.before = None if self.cursor else request.GET.get(BEFORE_VAR) or None
+        return super().get_queryset(request, exclude_parameters)
+
+    def keyset_enabled(self, request):
+        return bool(
+            self.model_admin.keyset_ordering
+            and ORDER_VAR not in self.params
+            and ALL_VAR not in request.GET
+            and not self.list_editable
+        )
+
+    def _page(self, ordering, cursor=None, backwards=False):
+        """Строки страницы в порядке ordering и есть ли еще строки в направлении чтения"""
+        if backwards:
+            ordering = reverse_ordering(ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if cursor:
+            try:
+                values = decode_cursor(cursor, self.model, ordering)
+            except ValueError as exc:
+                raise IncorrectLookupParameters(exc)
+            queryset = queryset.filter(seek_condition(ordering, values))
+
+        # Одна лишняя строка показывает, есть ли еще страница
+        rows = list(queryset[:self.list_per_page + 1])
+        has_more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+        if backwards:
+            rows.reverse()
+        return rows, has_more
+
+    def get_results(self, request):
+        self.keyset_active = self.keyset_enabled(request)
+        if not self.keyset_active:
+            return super().get_results(request)
+
+        ordering = self.model_admin.keyset_ordering
+        names = [field.lstrip('-') for field in ordering]
+        if self.before:
+            rows, has_previous = self._page(ordering, self.before, backwards=True)
+            has_next = True
+            if not has_previous:
+                # Дошли до начала списка: показываем первую страницу целиком
+                self.before = None
+                rows, has_next = self._page(ordering)
+        else:
+            rows, has_next = self._page(ordering, self.cursor)
+            has_previous = bool(self.cursor)
+
+        counted = self.queryset.order_by()[:COUNT_CAP + 1].count()
+        self.result_count = min(counted, COUNT_CAP)
+        self.result_count_capped = counted > COUNT_CAP
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_next or has_previous
+
+        self.first_page_url = self.get_query_string() if has_previous else None
+        self.previous_page_url = None
+        self.next_page_url = None
+        if rows and has_previous:
+            before = encode_cursor(getattr(rows[0], name) for name in names)
+            self.previous_page_url = self.get_query_string({BEFORE_VAR: before})
+        if rows and has_next:
+            next_cursor = encode_cursor(getattr(rows[-1], name) for name in names)
+            self.next_page_url = self.get_query_string({CURSOR_VAR: next_cursor})
+
+
+class KeysetPaginationMixin:
+    """Подключает KeysetChangeList; keyset_ordering — поля ключа, последним должен идти уникальный id"""
+    keyset_ordering = None
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,305 @@
+"""
+Расчет стоимости аренды.
+
+Одни и те же правила применяются в Python (методы RentalApplication) и в SQL
+(RentalApplicationQuerySet.with_pricing), поэтому тарифная сетка описана здесь один раз.
+Суммы считаются в целых рублях: цена за сутки, сумма скидки и итог округляются вниз до рубля.
+
+Цены берутся из тарифа транспорта (TransportTariff), действующего на дату начала аренды;
+если тарифов на эту дату нет — из колонок цен самого транспорта.
+
+Для публичного расчета стоимости цены всего парка держатся в памяти процесса (таблица тарифов).
+Таблица помечена версией цен (AvailabilityVersion с ключом TARIFFS), которая увеличивается при
+сохранении транспорта или тарифа в любом процессе: расчет читает одно число версии и перечитывает
+таблицу, только если версия сменилась.
+"""
+import threading
+from bisect import bisect_right
+
+from django.db.models import Case, F, Func, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Floor
+
+TIER_BASE = 'base'
+TIER_3_6 = '3_6'
+TIER_7_30 = '7_30'
+TIER_30_PLUS = '30_plus'
+
+RATE_TIER_LABELS = {
+    TIER_BASE: 'Базовый тариф',
+    TIER_3_6: 'Тариф 3-6 дней',
+    TIER_7_30: 'Тариф 7-30 дней',
+    TIER_30_PLUS: 'Тариф от 30 дней',
+}
+
+RATE_TIER_CHOICES = list(RATE_TIER_LABELS.items())
+
+# Поле цены транспорта для каждого тарифа
+TIER_PRICE_FIELDS = {
+    TIER_BASE: 'price_per_day',
+    TIER_3_6: 'price_3_6_days',
+    TIER_7_30: 'price_7_30_days',
+    TIER_30_PLUS: 'price_30_plus_days',
+}
+
+# Верхняя граница (включительно) количества суток для тарифа; последний тариф без границы
+TIER_MAX_DAYS = (
+    (TIER_BASE, 2),
+    (TIER_3_6, 6),
+    (TIER_7_30, 29),
+)
+
+
+def rate_tier_for_days(days):
+    """Тариф для аренды на указанное количество суток"""
+    for tier, max_days in TIER_MAX_DAYS:
+        if days <= max_days:
+            return tier
+    return TIER_30_PLUS
+
+
+def tariff_prices(transport, on_date=None):
+    """Цены транспорта по тарифам (тариф -> цена за сутки), действующие на дату on_date"""
+    from .models import TransportTariff
+
+    if on_date and transport.pk:
+        prices = TransportTariff.objects.filter(
+            transport_id=transport.pk, valid_from__lte=on_date
+        ).order_by('-valid_from').values_list(*TIER_PRICE_FIELDS.values()).first()
+        if prices:
+            return dict(zip(TIER_PRICE_FIELDS, prices))
+    return {tier: getattr(transport, field) for tier, field in TIER_PRICE_FIELDS.items()}
+
+
+def daily_rate_for(transport, days, on_date=None):
+    """Цена за сутки в целых рублях; 0, если транспорт не указан или аренда короче суток"""
+    if not transport or days <= 0:
+        return 0
+    return int(tariff_prices(transport, on_date)[rate_tier_for_days(days)])
+
+
+def discount_amount_for(daily_rate, days, discount):
+    """Сумма скидки в целых рублях"""
+    base_cost = daily_rate * days
+    return base_cost * discount // 100
+
+
+def total_cost_for(daily_rate, days, discount):
+    """Стоимость со скидкой в целых рублях"""
+    base_cost = daily_rate * days
+    return base_cost * (100 - discount) // 100
+
+
+# Таблица тарифов в памяти процесса вместе с версией цен, по которой она прочитана: (версия, таблица)
+_tariff_table = None
+_tariff_table_lock = threading.Lock()
+
+
+def _load_tariff_table():
+    from .models import Transport, TransportTariff
+
+    def whole_rubles(prices):
+        return dict(zip(TIER_PRICE_FIELDS, (int(price) for price in prices)))
+
+    transports = {}
+    categories = {}
+    rows = Transport.objects.order_by('number', 'id').values_list(
+        'id', 'category', 'city', *TIER_PRICE_FIELDS.values()
+    )
+    for transport_id, category, city, *prices in rows:
+        transports[transport_id] = {
+            'category': category,
+            'city': city,
+            'rates': whole_rubles(prices),
+            # Даты начала тарифов по возрастанию и цены для поиска bisect
+            'tariff_dates': [],
+            'tariff_rates': [],
+        }
+        if category:
+            categories.setdefault(category, []).append(transport_id)
+
+    tariffs = TransportTariff.objects.order_by('transport_id', 'valid_from').values_list(
+        'transport_id', 'valid_from', *TIER_PRICE_FIELDS.values()
+    )
+    for transport_id, valid_from, *prices in tariffs:
+        tariff = transports.get(transport_id)
+        if tariff is not None:
+            tariff['tariff_dates'].append(valid_from)
+            tariff['tariff_rates'].append(whole_rubles(prices))
+    return {'transports': transports, 'categories': categories}
+
+
+def _rates_on(tariff, on_date):
+    """Цены из таблицы тарифов, действующие на дату on_date"""
+    if on_date:
+        index = bisect_right(tariff['tariff_dates'], on_date)
+        if index:
+            return tariff['tariff_rates'][index - 1]
+    return tariff['rates']
+
+
+def tariff_table(version=None):
+    """
+    Цены всего парка по тарифам: {'transports': {id: {...}}, 'categories': {категория: [id]}}.
+
+    version — уже прочитанная версия цен, чтобы не читать ее повторно (например, при импорте).
+    """
+    from .availability_cache import TARIFFS, get_version
+
+    global _tariff_table
+
+    if version is None:
+        version = get_version(TARIFFS)
+    cached = _tariff_table
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _tariff_table_lock:
+        if _tariff_table is None or _tariff_table[0] != version:
+            _tariff_table = (version, _load_tariff_table())
+        return _tariff_table[1]
+
+
+def invalidate_tariff_table():
+    """Сбрасывает таблицу тарифов в этом процессе и версию цен для остальных процессов"""
+    from .availability_cache import bump_tariff_version
+
+    global _tariff_table
+    _tariff_table = None
+    bump_tariff_version()
+
+
+def quote(rates, days, discount=0):
+    """Расчет стоимости по ценам тарифов транспорта (словарь тариф -> цена за сутки)"""
+    tier = rate_tier_for_days(days)
+    daily_rate = rates[tier] if days > 0 else 0
+    return {
+        'rental_days': days,
+        'rate_tier': tier,
+        'rate_type': RATE_TIER_LABELS[tier],
+        'tiers': [
+            {'tier': code, 'label': label, 'daily_rate': rates[code], 'applied': code == tier}
+            for code, label in RATE_TIER_LABELS.items()
+        ],
+        'daily_rate': daily_rate,
+        'base_cost': daily_rate * days,
+        'discount': discount,
+        'discount_amount': discount_amount_for(daily_rate, days, discount),
+        'total_cost': total_cost_for(daily_rate, days, discount),
+    }
+
+
+def quote_transport(transport_id, days, discount=0, start_date=None, version=None):
+    """Расчет стоимости для транспорта или None, если транспорт не найден; version — см. tariff_table"""
+    tariff = tariff_table(version)['transports'].get(transport_id)
+    if tariff is None:
+        return None
+    return dict(quote(_rates_on(tariff, start_date), days, discount), transport_id=transport_id)
+
+
+def quote_category(category, days, discount=0, city=None, start_date=None):
+    """Расчет «от»: самый дешевый транспорт категории (в городе, если указан) или None"""
+    table = tariff_table()
+    best = None
+    for transport_id in table['categories'].get(category, ()):
+        tariff = table['transports'][transport_id]
+        if city and tariff['city'] != city:
+            continue
+        result = quote(_rates_on(tariff, start_date), days, discount)
+        if best is None or result['total_cost'] < best['total_cost']:
+            best = dict(result, transport_id=transport_id)
+    return best
+
+
+class DaysBetween(Func):
+    """Количество суток между двумя датами (end - start) целым числом"""
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def _compile_args(self, compiler):
+        end, start = self.get_source_expressions()
+        end_sql, end_params = compiler.compile(end)
+        start_sql, start_params = compiler.compile(start)
+        return end_sql, start_sql, (*end_params, *start_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: разность двух date — целое число суток
+        end_sql, start_sql, params = self._compile_args(compiler)
+        return f'({end_sql} - {start_sql})', params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        end_sql, start_sql, params = self._compile_args(compiler)
+        return f'CAST(JULIANDAY({end_sql}) - JULIANDAY({start_sql}) AS INTEGER)', params
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        end_sql, start_sql, params = self._compile_args(compiler)
+        return f'DATEDIFF({end_sql}, {start_sql})', params
+
+
+def _whole_rubles(expression):
+    return Cast(Floor(expression), IntegerField())
+
+
+def _tier_price(tier, transport_ref, on_date, transport_prefix=''):
+    """
+    Цена тарифа в SQL: из последнего TransportTariff с valid_from <= on_date,
+    иначе из колонки цены транспорта. Подзапрос идет по индексу (transport, valid_from).
+    """
+    from .models import TransportTariff
+
+    field = TIER_PRICE_FIELDS[tier]
+    tariff_price = TransportTariff.objects.filter(
+        transport_id=transport_ref, valid_from__lte=on_date
+    ).order_by('-valid_from').values(field)[:1]
+    return Coalesce(Subquery(tariff_price), F(f'{transport_prefix}{field}'))
+
+
+def pricing_annotations():
+    """
+    Выражения для аннотаций стоимости аренды по текущим тарифам транспорта, в порядке зависимости.
+
+    Возвращает список словарей: каждый следующий ссылается на имена из предыдущих,
+    поэтому их нужно передавать в отдельные вызовы annotate(). Имена начинаются с live_,
+    чтобы не пересекаться с сохраненным в заявке снимком стоимости.
+    """
+    def price(tier):
+        return _whole_rubles(_tier_price(tier, OuterRef('transport_id'), OuterRef('rental_start_date'), 'transport__'))
+
+    tier_whens = [When(live_rental_days__lte=max_days, then=Value(tier)) for tier, max_days in TIER_MAX_DAYS]
+    rate_whens = [When(live_rental_days__lte=0, then=Value(0))] + [
+        When(live_rental_days__lte=max_days, then=price(tier))
+        for tier, max_days in TIER_MAX_DAYS
+    ]
+    base_cost = F('live_daily_rate') * F('live_rental_days')
+    return [
+        {'live_rental_days': Coalesce(DaysBetween(F('rental_end_date'), F('rental_start_date')), Value(0))},
+        {
+            'live_rate_tier': Case(*tier_whens, default=Value(TIER_30_PLUS)),
+            'live_daily_rate': Case(*rate_whens, default=price(TIER_30_PLUS), output_field=IntegerField()),
+        },
+        {
+            'live_discount_amount': _whole_rubles(base_cost * F('discount') / Value(100)),
+            'live_total_cost': _whole_rubles(base_cost * (Value(100) - F('discount')) / Value(100)),
+        },
+    ]
+
+
+def snapshot_discount_amount():
+    """Сумма скидки в SQL по снимку стоимости заявки (daily_rate и rental_days)"""
+    return _whole_rubles(F('daily_rate') * F('rental_days') * F('discount') / Value(100))
+
+
+def transport_price_annotations(days, start_date, discount=0):
+    """
+    Аннотации daily_rate и total_cost для queryset транспорта при аренде на days суток с start_date.
+
+    Количество суток одинаково для всех строк, поэтому тариф выбирается заранее
+    и в SQL остается одно выражение над ценой — сортировка по нему дешевая.
+    """
+    if days <= 0:
+        return {'daily_rate': Value(0), 'total_cost': Value(0)}
+    daily_rate = _whole_rubles(_tier_price(rate_tier_for_days(days), OuterRef('pk'), start_date))
+    return {
+        'daily_rate': daily_rate,
+        'total_cost': _whole_rubles(daily_rate * Value(days * (100 - discount)) / Value(100)),
+    }
@@ -0,0 +1,142 @@
+"""
+Отчеты по парку транспорта.
+
+Отчеты считаются одним потоковым проходом по values_list заявок, без создания
+экземпляров моделей, поэтому остаются быстрыми на истории за несколько лет.
+"""
+import calendar
+from datetime import date, timedelta
+
+from .models import RentalApplication, Transport
+
+# Заявки в этих статусах означают, что транспорт фактически был в аренде
+RENTED_STATUSES = (
+    RentalApplication.STATUS_ACTIVE,
+    RentalApplication.STATUS_COMPLETED,
+    RentalApplication.STATUS_OVERDUE,
+)
+
+
+def _month_starts(period_start, period_end):
+    """Первые числа месяцев, которые задевает период"""
+    month = period_start.replace(day=1)
+    while month <= period_end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 1) if whole else 0
+
+
+def fleet_utilisation(period_start, period_end, city=None):
+    """
+    Загрузка парка: доля суток, когда транспорт был в аренде, за период [period_start, period_end].
+
+    Сутки аренды считаются так же, как в get_rental_days: бронь с start по end
+    занимает ночи [start, end), поэтому возврат и новая выдача в один день не
+    считаются дважды. Каждая бронь обрезается по границам периода и месяцев.
+
+    Returns:
+        dict со списками by_transport, by_category, by_city, by_month и итогом total
+    """
+    window_end = period_end + timedelta(days=1)
+    period_days = (window_end - period_start).days
+
+    transports = Transport.objects.all()
+    if city:
+        transports = transports.filter(city=city)
+    transport_rows = list(
+        transports.order_by('number', 'id').values_list('id', 'number', 'name', 'model', 'category', 'city')
+    )
+    transport_info = {row[0]: row for row in transport_rows}
+
+    months = list(_month_starts(period_start, period_end))
+    month_bounds = []
+    for month in months:
+        month_end = month.replace(day=calendar.monthrange(month.year, month.month)[1]) + timedelta(days=1)
+        month_bounds.append((month, max(month, period_start), min(month_end, window_end)))
+
+    rented_by_transport = dict.fromkeys(transport_info, 0)
+    rented_by_month = dict.fromkeys(months, 0)
+
+    bookings = RentalApplication.objects.filter(
+        status__in=RENTED_STATUSES,
+        transport_id__in=transports.values('id'),
+        rental_start_date__lt=window_end,
+        rental_end_date__gt=period_start,
+    ).values_list('transport_id', 'rental_start_date', 'rental_end_date')
+
+    for transport_id, booking_start, booking_end in bookings.iterator():
+        start = max(booking_start, period_start)
+        end = min(booking_end, window_end)
+        if end <= start:
+            continue
+        rented_by_transport[transport_id] += (end - start).days
+        for month, month_start, month_end in month_bounds:
+            overlap = (min(end, month_end) - max(start, month_start)).days
+            if overlap > 0:
+                rented_by_month[month] += overlap
+
+    by_transport = []
+    by_category = {}
+    by_city = {}
+    for transport_id, number, name, model, category, transport_city in transport_rows:
+        rented = rented_by_transport[transport_id]
+        by_transport.append({
+            'id': transport_id,
+            'label': f"№{number} - {name} {model}",
+            'category': category or 'Без категории',
+            'city': transport_city,
+            'rented_days': rented,
+            'available_days': period_days,
+            'utilisation': _percent(rented, period_days),
+        })
+        for groups, key in ((by_category, category or 'Без категории'), (by_city, transport_city)):
+            group = groups.setdefault(key, {'name': key, 'vehicles': 0, 'rented_days': 0, 'available_days': 0})
+            group['vehicles'] += 1
+            group['rented_days'] += rented
+            group['available_days'] += period_days
+
+    for groups in (by_category, by_city):
+        for group in groups.values():
+            group['utilisation'] = _percent(group['rented_days'], group['available_days'])
+
+    fleet_size = len(transport_rows)
+    by_month = []
+    for month, month_start, month_end in month_bounds:
+        available = (month_end - month_start).days * fleet_size
+        by_month.append({
+            'month': month.strftime('%Y-%m'),
+            'rented_days': rented_by_month[month],
+            'available_days': available,
+            'utilisation': _percent(rented_by_month[month], available),
+        })
+
+    total_rented = sum(rented_by_transport.values())
+    total_available = period_days * fleet_size
+    city_names = dict(Transport._meta.get_field('city').choices)
+    for group in by_city.values():
+        group['name'] = city_names.get(group['name'], group['name'])
+
+    return {
+        'by_transport': sorted(by_transport, key=lambda row: -row['utilisation']),
+        'by_category': sorted(by_category.values(), key=lambda row: row['name']),
+        'by_city': sorted(by_city.values(), key=lambda row: row['name']),
+        'by_month': by_month,
+        'total': {
+            'vehicles': fleet_size,
+            'rented_days': total_rented,
+            'available_days': total_available,
+            'utilisation': _percent(total_rented, total_available),
+        },
+    }
+
+
+def default_report_period(today=None):
+    """Последние 12 месяцев, включая текущий"""
+    today = today or date.today()
+    start = today.replace(day=1)
+    for _ in range(11):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return start, today
@@ -60,6 +60,8 @@
         data: {
           start_date: startDate,
           end_date: endDate,
+          // Варианты со стоимостью за период, от дешевых к дорогим
+          priced: 1,
         },
         success: function (response) {
           console.log("Server response:", response);
@@ -0,0 +1,1078 @@
+import os
+import random
+import re
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import availability, availability_cache, pricing
+from .availability_cache import bump_tariff_version, get_version
+from .calendar_feed import booking_window, return_window
+from .pagination import encode_cursor
+from .models import (
+    Calendar, Client, RentalApplication, Transport, TransportDayOccupancy, TransportTariff, UserProfile,
+    business_date,
+)
+
+# «SCAN <таблица>» в выводе EXPLAIN QUERY PLAN — обход всей таблицы или всего индекса
+FULL_SCAN_RE = re.compile(r'\bSCAN (?:TABLE )?(\w+)')
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Параллельные брони одного транспорта: проходит ровно одна"""
+
+    threads_count = 8
+
+    def setUp(self):
+        self.transport = Transport.objects.create(name='Проверка параллельных броней', model='-', year=2020)
+        self.client_record = Client.objects.create(full_name='Проверка параллельных броней', phone_number='+79990000001')
+
+    def _book(self, start_date, barrier, outcomes):
+        outcome = 'error'
+        try:
+            barrier.wait()
+            RentalApplication(
+                client=self.client_record,
+                full_name=self.client_record.full_name,
+                phone_number=self.client_record.phone_number,
+                rental_start_date=start_date,
+                rental_end_date=start_date + timedelta(days=3),
+                transport_id=self.transport.pk,
+            ).save()
+            outcome = 'created'
+        except ValidationError:
+            outcome = 'rejected'
+        except OperationalError:
+            # База занята дольше таймаута — бронь не создана, это допустимо
+            outcome = 'error'
+        finally:
+            connection.close()
+            outcomes.append(outcome)
+
+    def test_only_one_overlapping_booking_is_created(self):
+        start_date = date(2030, 6, 1)
+        barrier = threading.Barrier(self.threads_count)
+        outcomes = []
+        workers = [
+            threading.Thread(target=self._book, args=(start_date, barrier, outcomes))
+            for _ in range(self.threads_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(outcomes.count('created'), 1, outcomes)
+        self.assertEqual(RentalApplication.objects.filter(transport=self.transport).count(), 1)
+        self.assertEqual(self.transport.day_occupancy.count(), 4)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы проверяются по выводу EXPLAIN QUERY PLAN SQLite')
+class HotQueryPlanTests(TestCase):
+    """Горячие запросы доступности, календаря, просрочки и аналитики не читают таблицы целиком"""
+
+    # Полный обход этих таблиц в горячих запросах недопустим
+    guarded_tables = (
+        RentalApplication._meta.db_table,
+        Calendar._meta.db_table,
+        Client._meta.db_table,
+        TransportDayOccupancy._meta.db_table,
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = date(2030, 6, 15)
+        transports = [
+            Transport.objects.create(name=f'Транспорт {number}', model='-', year=2020, number=number, city='sochi')
+            for number in range(1, 4)
+        ]
+        for index in range(30):
+            start = cls.today + timedelta(days=index * 5 - 60)
+            RentalApplication.objects.create(
+                full_name=f'Клиент {index}',
+                phone_number=f'+7999000{index:04d}',
+                rental_start_date=start,
+                rental_end_date=start + timedelta(days=3),
+                transport=transports[index % len(transports)],
+                status=RentalApplication.STATUS_ACTIVE if index % 2 else RentalApplication.STATUS_RESERVED,
+                city='sochi',
+            )
+            event_start = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+            Calendar.objects.create(
+                transport=transports[index % len(transports)],
+                title=f'Событие {index}',
+                start=event_start,
+                end=event_start + timedelta(days=1),
+                city='sochi',
+            )
+        cls.transport = transports[0]
+
+    def hot_queries(self):
+        """Запросы в том виде, в каком их строит код"""
+        today = self.today
+        window_start = today.replace(day=1)
+        window_end = window_start + timedelta(days=42)
+        booking_applications, booking_manual = booking_window(window_start, window_end, 'sochi', None)
+        return_applications, return_manual = return_window(window_start, window_end, 'sochi', None)
+        return [
+            ('Свободный транспорт на период',
+             availability.available_transport(today, today + timedelta(days=3), city='sochi')),
+            ('Проверка доступности транспорта',
+             TransportDayOccupancy.objects.filter(
+                 transport_id=self.transport.pk, day__range=(today, today + timedelta(days=3)))),
+            ('Лента календаря: заявки, пересекающие окно', booking_applications),
+            ('Лента календаря: ручные события, пересекающие окно', booking_manual),
+            ('Лента календаря возвратов: заявки', return_applications),
+            ('Лента календаря возвратов: ручные события', return_manual),
+            ('Просроченные аренды', RentalApplication.objects.overdue()),
+            ('Заявки города за месяц',
+             RentalApplication.objects.filter(city='sochi', created_at__year=today.year, created_at__month=today.month)),
+            ('Новые клиенты за месяц',
+             Client.objects.filter(created_at__year=today.year, created_at__month=today.month)),
+        ]
+
+    def test_hot_queries_do_not_scan_tables(self):
+        for title, queryset in self.hot_queries():
+            with self.subTest(title):
+                plan = queryset.explain()
+                scanned = [
+                    match.group(1)
+                    for match in (FULL_SCAN_RE.search(line) for line in plan.splitlines())
+                    if match and match.group(1) in self.guarded_tables
+                ]
+                self.assertEqual(scanned, [], plan)
+
+
+class OccupancyHistoryTests(TestCase):
+    """Дни завершенных и отмененных броней остаются в таблице занятости, но транспорт не занимают"""
+
+    def setUp(self):
+        self.transport = Transport.objects.create(name='Транспорт', model='-', year=2020)
+        self.booking = RentalApplication.objects.create(
+            full_name='Клиент',
+            phone_number='+79990000002',
+            rental_start_date=date(2030, 6, 1),
+            rental_end_date=date(2030, 6, 3),
+            transport=self.transport,
+        )
+
+    def days(self):
+        return list(self.transport.day_occupancy.order_by('day').values_list('day', 'application_id', 'status'))
+
+    def test_cancelled_booking_keeps_days_and_frees_transport(self):
+        self.booking.status = RentalApplication.STATUS_CANCELLED
+        self.booking.save()
+
+        self.assertEqual(self.days(), [
+            (date(2030, 6, day), self.booking.pk, RentalApplication.STATUS_CANCELLED) for day in (1, 2, 3)
+        ])
+        self.assertIsNone(availability.find_conflict(self.transport.pk, date(2030, 6, 1), date(2030, 6, 3)))
+
+        replacement = RentalApplication.objects.create(
+            full_name='Другой клиент',
+            phone_number='+79990000003',
+            rental_start_date=date(2030, 6, 2),
+            rental_end_date=date(2030, 6, 4),
+            transport=self.transport,
+        )
+        self.assertEqual(
+            self.transport.day_occupancy.filter(status__in=RentalApplication.OCCUPYING_STATUSES).count(), 3
+        )
+        self.assertEqual(
+            self.transport.day_occupancy.filter(application=replacement, day=date(2030, 6, 2)).count(), 1
+        )
+
+    def test_overlapping_booking_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            RentalApplication.objects.create(
+                full_name='Другой клиент',
+                phone_number='+79990000003',
+                rental_start_date=date(2030, 6, 3),
+                rental_end_date=date(2030, 6, 5),
+                transport=self.transport,
+            )
+
+
+class BackfillPricingTests(TestCase):
+    """Пересчет снимка стоимости обновляет updated_at и версию данных города"""
+
+    def test_recalculation_touches_updated_at_and_version(self):
+        transport = Transport.objects.create(name='Транспорт', model='-', year=2020, city='adler', price_per_day=1000)
+        booking = RentalApplication.objects.create(
+            full_name='Клиент',
+            phone_number='+79990000004',
+            rental_start_date=date(2030, 6, 1),
+            rental_end_date=date(2030, 6, 3),
+            transport=transport,
+            city='adler',
+        )
+        Transport.objects.filter(pk=transport.pk).update(price_per_day=1500)
+        version = get_version('adler')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_pricing', '--all', stdout=StringIO())
+
+        refreshed = RentalApplication.objects.get(pk=booking.pk)
+        self.assertEqual(refreshed.total_cost, 3000)
+        self.assertGreater(refreshed.updated_at, booking.updated_at)
+        self.assertGreater(get_version('adler'), version)
+
+
+class TariffTableTests(TestCase):
+    """Таблица тарифов в памяти процесса перечитывается по версии цен, а не по времени"""
+
+    def setUp(self):
+        # Таблица живет в памяти процесса и могла остаться от другого теста
+        pricing.invalidate_tariff_table()
+
+    def test_quote_follows_price_version(self):
+        transport = Transport.objects.create(name='Транспорт', model='-', year=2020, price_per_day=1000)
+        self.assertEqual(pricing.quote_transport(transport.pk, 2)['total_cost'], 2000)
+
+        # Другой процесс меняет цену и версию цен: локальная таблица этого процесса не сбрасывалась
+        Transport.objects.filter(pk=transport.pk).update(price_per_day=1500)
+        self.assertEqual(pricing.quote_transport(transport.pk, 2)['total_cost'], 2000)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_tariff_version()
+        self.assertEqual(pricing.quote_transport(transport.pk, 2)['total_cost'], 3000)
+
+    def test_tariff_change_invalidates_table(self):
+        transport = Transport.objects.create(name='Транспорт', model='-', year=2020, price_per_day=1000)
+        self.assertEqual(pricing.quote_transport(transport.pk, 2, start_date=date(2030, 6, 1))['daily_rate'], 1000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TransportTariff.objects.create(transport=transport, valid_from=date(2030, 1, 1), price_per_day=1200)
+        self.assertEqual(pricing.quote_transport(transport.pk, 2, start_date=date(2030, 6, 1))['daily_rate'], 1200)
+        # Пока версия цен не менялась, расчет читает из базы только ее
+        with self.assertNumQueries(1):
+            self.assertEqual(pricing.quote_transport(transport.pk, 2, start_date=date(2029, 6, 1))['daily_rate'], 1000)
+
+
+class ChangelistQueryBudgetTests(TestCase):
+    """Список заявок в админке рендерится за постоянное число запросов независимо от размера страницы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        managers = [User.objects.create_user(f'manager{index}') for index in range(3)]
+        transports = [
+            Transport.objects.create(name=f'Транспорт {number}', model='-', year=2020, number=number)
+            for number in range(1, 5)
+        ]
+        for index in range(12):
+            start = date(2030, 1, 1) + timedelta(days=index * 10)
+            RentalApplication.objects.create(
+                full_name=f'Клиент {index}',
+                phone_number=f'+7999100{index:04d}',
+                rental_start_date=start,
+                rental_end_date=start + timedelta(days=index % 5 + 1),
+                transport=transports[index % len(transports)],
+                created_by=managers[index % len(managers)],
+                discount=(0, 10, 20)[index % 3],
+            )
+
+    def count_queries(self, per_page):
+        model_admin = admin.site._registry[RentalApplication]
+        admin_class = type('QueryBudgetAdmin', (model_admin.__class__,), {'list_per_page': per_page})
+        budget_admin = admin_class(RentalApplication, model_admin.admin_site)
+
+        request = RequestFactory().get('/admin/rentals/rentalapplication/')
+        request.user = self.user
+        with CaptureQueriesContext(connection) as context:
+            response = budget_admin.changelist_view(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.assertEqual(self.count_queries(3), self.count_queries(30))
+
+
+class ImportRentalsTests(TestCase):
+    """Брони из файла, пересекающиеся с уже занятыми днями, не импортируются и попадают в отчет"""
+
+    def setUp(self):
+        self.transport = Transport.objects.create(name='Транспорт', model='-', year=2020, price_per_day=1000)
+        self.existing = RentalApplication.objects.create(
+            full_name='Клиент',
+            phone_number='+79990000005',
+            rental_start_date=date(2030, 6, 1),
+            rental_end_date=date(2030, 6, 3),
+            transport=self.transport,
+        )
+        pk = self.transport.pk
+        self.rows = (
+            ('Пересекается с базой', '+79990000006', '2030-06-03', '2030-06-05', pk, 'reserved'),
+            ('Свободные даты', '+79990000007', '2030-06-10', '2030-06-12', pk, 'reserved'),
+            ('Пересекается с импортом', '+79990000008', '2030-06-12', '2030-06-14', pk, 'active'),
+            ('Завершенная', '+79990000009', '2030-06-01', '2030-06-02', pk, 'completed'),
+        )
+
+    def import_rows(self, *rows, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as source:
+            source.write('full_name,phone_number,rental_start_date,rental_end_date,transport_id,status\n')
+            for row in rows:
+                source.write(','.join(map(str, row)) + '\n')
+        self.addCleanup(os.remove, source.name)
+        output = StringIO()
+        call_command('import_rentals', source.name, stdout=output, **options)
+        return output.getvalue()
+
+    def test_overlapping_rows_are_skipped(self):
+        output = self.import_rows(*self.rows)
+
+        statuses = dict(RentalApplication.objects.values_list('full_name', 'status'))
+        self.assertEqual(statuses, {
+            'Клиент': RentalApplication.STATUS_RESERVED,
+            'Свободные даты': RentalApplication.STATUS_RESERVED,
+            'Завершенная': RentalApplication.STATUS_COMPLETED,
+        })
+        self.assertIn(f'Строка 2: бронь пересекается с заявкой {self.existing.pk} на 03.06.2030', output)
+        self.assertIn('Строка 4: бронь пересекается со строкой 3 на 12.06.2030', output)
+        self.assertIn('Импортировано заявок: 2', output)
+        self.assertIn('пропущено из-за пересечений: 2', output)
+
+        # Занятые дни принадлежат только заявкам, которые занимают транспорт
+        occupied = self.transport.day_occupancy.filter(status__in=RentalApplication.OCCUPYING_STATUSES)
+        self.assertEqual(
+            set(occupied.values_list('application__full_name', flat=True)), {'Клиент', 'Свободные даты'}
+        )
+        self.assertEqual(occupied.count(), 6)
+        self.assertEqual(self.transport.day_occupancy.count(), 8)
+
+    def test_dry_run_reports_overlaps_without_writing(self):
+        output = self.import_rows(*self.rows, dry_run=True)
+
+        self.assertEqual(RentalApplication.objects.count(), 1)
+        self.assertEqual(self.transport.day_occupancy.count(), 3)
+        self.assertIn(f'Строка 2: бронь пересекается с заявкой {self.existing.pk} на 03.06.2030', output)
+        self.assertIn('Строка 4: бронь пересекается со строкой 3 на 12.06.2030', output)
+        self.assertIn('к импорту: 2, пересечений: 2', output)
+
+
+class CalendarWindowTests(TestCase):
+    """Окно ленты календаря [start, end): брони на краях окна"""
+
+    window_start = date(2030, 6, 1)
+    window_end = date(2030, 7, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.transport = Transport.objects.create(name='Транспорт', model='-', year=2020, city='sochi')
+        cls.bookings = {}
+        for index, (name, start, end) in enumerate((
+            ('spans_window', date(2030, 5, 20), date(2030, 7, 10)),
+            ('crosses_start', date(2030, 5, 25), date(2030, 6, 5)),
+            ('crosses_end', date(2030, 6, 25), date(2030, 7, 5)),
+            ('inside', date(2030, 6, 10), date(2030, 6, 12)),
+            ('ends_on_start', date(2030, 5, 28), date(2030, 6, 1)),
+            ('ends_before_start', date(2030, 5, 25), date(2030, 5, 31)),
+            ('starts_on_end', date(2030, 7, 1), date(2030, 7, 3)),
+            ('ends_on_end', date(2030, 6, 28), date(2030, 7, 1)),
+        )):
+            # Брони не пересекаются по занятости: каждая на своем транспорте
+            transport = Transport.objects.create(name=f'Транспорт {index}', model='-', year=2020, city='sochi')
+            cls.bookings[name] = RentalApplication.objects.create(
+                full_name=name,
+                phone_number=f'+7999200{index:04d}',
+                rental_start_date=start,
+                rental_end_date=end,
+                transport=transport,
+                city='sochi',
+            ).pk
+
+        def at(day, hour=0):
+            return timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=hour)
+
+        cls.events = {}
+        for name, start, end in (
+            ('spans_window', at(date(2030, 5, 20)), at(date(2030, 7, 10))),
+            ('crosses_start', at(date(2030, 5, 31), 12), at(date(2030, 6, 1), 12)),
+            ('crosses_end', at(date(2030, 6, 30), 12), at(date(2030, 7, 1), 12)),
+            ('ends_on_start', at(date(2030, 5, 31)), at(date(2030, 6, 1))),
+            ('starts_on_end', at(date(2030, 7, 1)), at(date(2030, 7, 2))),
+        ):
+            cls.events[name] = Calendar.objects.create(
+                transport=cls.transport, title=name, start=start, end=end, city='sochi',
+            ).pk
+
+    def names(self, queryset, ids):
+        found = set(queryset.values_list('id', flat=True))
+        return {name for name, pk in ids.items() if pk in found}
+
+    def test_booking_window_includes_bookings_across_edges(self):
+        applications, events = booking_window(self.window_start, self.window_end, 'sochi', None)
+
+        self.assertEqual(self.names(applications, self.bookings), {
+            'spans_window', 'crosses_start', 'crosses_end', 'inside', 'ends_on_start', 'ends_on_end',
+        })
+        self.assertEqual(self.names(events, self.events), {'spans_window', 'crosses_start', 'crosses_end'})
+
+    def test_booking_window_excludes_bookings_starting_on_window_end(self):
+        applications, events = booking_window(self.window_start, self.window_end, 'sochi', None)
+
+        self.assertNotIn('starts_on_end', self.names(applications, self.bookings))
+        self.assertNotIn('starts_on_end', self.names(events, self.events))
+
+    def test_booking_window_on_window_start(self):
+        applications, events = booking_window(self.window_start, self.window_end, 'sochi', None)
+
+        # Дата окончания аренды входит в бронь, поэтому бронь, заканчивающаяся в первый день окна, видна;
+        # ручное событие, закончившееся ровно в полночь начала окна, — нет
+        self.assertIn('ends_on_start', self.names(applications, self.bookings))
+        self.assertNotIn('ends_before_start', self.names(applications, self.bookings))
+        self.assertNotIn('ends_on_start', self.names(events, self.events))
+
+    def test_return_window_is_half_open(self):
+        applications, events = return_window(self.window_start, self.window_end, 'sochi', None)
+
+        self.assertEqual(self.names(applications, self.bookings), {'crosses_start', 'inside', 'ends_on_start'})
+        self.assertEqual(self.names(events, self.events), {'crosses_start', 'ends_on_start'})
+
+
+class CalendarWindowRandomTests(TestCase):
+    """Окна лент календаря совпадают с перебором в Python на случайных бронях вокруг краев окна"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1)
+        transports = [
+            Transport.objects.create(name=f'Транспорт {number}', model='-', year=2020, number=number, city=city)
+            for number, city in enumerate(('sochi', 'sochi', 'sochi', 'adler'), start=1)
+        ]
+        history_start = date(2030, 5, 1)
+        # Завершенные заявки транспорт не занимают: даты могут пересекаться
+        cls.bookings = RentalApplication.objects.bulk_create([
+            RentalApplication(
+                full_name=f'Клиент {index}',
+                phone_number='+79990000000',
+                rental_start_date=start,
+                rental_end_date=start + timedelta(days=rng.randint(0, 40)),
+                transport=transport,
+                status=RentalApplication.STATUS_COMPLETED,
+                city=transport.city,
+            )
+            for index, transport, start in (
+                (index, rng.choice(transports), history_start + timedelta(days=rng.randrange(120)))
+                for index in range(300)
+            )
+        ])
+        cls.events = []
+        for index in range(300):
+            transport = rng.choice(transports)
+            start = timezone.make_aware(datetime.combine(
+                history_start + timedelta(days=rng.randrange(120)), datetime.min.time()
+            )) + timedelta(hours=rng.randrange(24))
+            end = start + timedelta(hours=rng.randint(1, 24 * 10))
+            if index % 3 == 0:
+                # Часть событий заканчивается ровно в полночь — на границе окна
+                end = timezone.make_aware(datetime.combine(end.date() + timedelta(days=1), datetime.min.time()))
+            cls.events.append(Calendar(
+                transport=transport, title=f'Событие {index}', start=start, end=end, city=transport.city,
+            ))
+        Calendar.objects.bulk_create(cls.events)
+        cls.sochi = [transport.pk for transport in transports if transport.city == 'sochi']
+
+    windows = (
+        (date(2030, 6, 1), date(2030, 7, 1)),
+        (date(2030, 6, 15), date(2030, 6, 18)),
+        (date(2030, 5, 26), date(2030, 7, 7)),
+    )
+
+    def expected(self, returns, start_date, end_date, transport_ids):
+        start_at = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        end_at = timezone.make_aware(datetime.combine(end_date, datetime.min.time()))
+        bookings = [b for b in self.bookings if b.city == 'sochi' and b.transport_id in transport_ids]
+        events = [e for e in self.events if e.city == 'sochi' and e.transport_id in transport_ids]
+        if returns:
+            return (
+                {b.pk for b in bookings if start_date <= b.rental_end_date < end_date},
+                {e.pk for e in events if start_at <= e.end < end_at},
+            )
+        return (
+            {b.pk for b in bookings if b.rental_start_date < end_date and b.rental_end_date >= start_date},
+            {e.pk for e in events if e.start < end_at and e.end > start_at},
+        )
+
+    def test_windows_match_brute_force(self):
+        for window, returns in ((booking_window, False), (return_window, True)):
+            for start_date, end_date in self.windows:
+                for transport_ids in (None, self.sochi[:1]):
+                    with self.subTest(window=window.__name__, start=start_date, end=end_date, transports=transport_ids):
+                        applications, events = window(start_date, end_date, 'sochi', transport_ids)
+                        expected = self.expected(returns, start_date, end_date, transport_ids or self.sochi)
+                        self.assertEqual((
+                            set(applications.values_list('id', flat=True)),
+                            set(events.values_list('id', flat=True)),
+                        ), expected)
+                        if transport_ids is None:
+                            # Перебор сверяет непустые выборки
+                            self.assertTrue(all(expected))
+
+
+class KnownBookingsMixin:
+    """
+    Известный набор броней июня 2030: в Сочи транспорт №1 (бронь 5–10 июня и аренда через конец месяца)
+    и №2 (аренда через начало месяца и отмененная бронь), в Адлере транспорт №3
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.first = Transport.objects.create(name='Первый', model='-', year=2020, number=1, city='sochi')
+        cls.second = Transport.objects.create(name='Второй', model='-', year=2020, number=2, city='sochi')
+        cls.third = Transport.objects.create(name='Третий', model='-', year=2020, number=3, city='adler')
+        for index, (transport, start, end, status) in enumerate((
+            (cls.first, date(2030, 6, 5), date(2030, 6, 10), RentalApplication.STATUS_RESERVED),
+            (cls.first, date(2030, 6, 28), date(2030, 7, 3), RentalApplication.STATUS_ACTIVE),
+            (cls.second, date(2030, 5, 30), date(2030, 6, 2), RentalApplication.STATUS_ACTIVE),
+            (cls.second, date(2030, 6, 15), date(2030, 6, 16), RentalApplication.STATUS_CANCELLED),
+            (cls.third, date(2030, 6, 10), date(2030, 6, 12), RentalApplication.STATUS_RESERVED),
+        )):
+            RentalApplication.objects.create(
+                full_name=f'Клиент {index}',
+                phone_number=f'+7999300{index:04d}',
+                rental_start_date=start,
+                rental_end_date=end,
+                transport=transport,
+                status=status,
+                city=transport.city,
+            )
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.manager = User.objects.create_user('manager', is_staff=True)
+        UserProfile.objects.create(user=cls.manager, city='adler')
+
+
+class AvailabilityMatrixTests(KnownBookingsMixin, TestCase):
+    """Матрица доступности по нескольким периодам и карта занятости календаря для известных броней"""
+
+    def matrix(self, user, ranges, **params):
+        self.client.force_login(user)
+        query = dict(params, start_date=[start for start, _ in ranges], end_date=[end for _, end in ranges])
+        return self.client.get(reverse('rentals:get_availability_matrix'), query).json()
+
+    def test_matrix_for_known_bookings(self):
+        data = self.matrix(self.superuser, [
+            # День окончания брони занят: период с 10 июня пересекается с бронью 5–10 июня
+            ('2030-06-10', '2030-06-12'),
+            ('2030-06-11', '2030-06-14'),
+            # Отмененная бронь транспорт не занимает
+            ('2030-06-15', '2030-06-16'),
+            ('2030-06-01', '2030-06-04'),
+        ], city='sochi')
+
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual([transport['id'] for transport in data['transports']], [self.first.pk, self.second.pk])
+        self.assertEqual(data['matrix'], ['0111', '1110'])
+
+    def test_matrix_uses_manager_city(self):
+        data = self.matrix(self.manager, [('2030-06-12', '2030-06-13'), ('2030-06-13', '2030-06-14')], city='sochi')
+
+        self.assertEqual([transport['id'] for transport in data['transports']], [self.third.pk])
+        self.assertEqual(data['matrix'], ['01'])
+
+    def test_calendar_occupancy_for_known_bookings(self):
+        self.client.force_login(self.superuser)
+        data = self.client.get(reverse('rentals:admin_calendar_occupancy'), {'month': '2030-06', 'city': 'sochi'}).json()
+
+        self.assertEqual(data['month'], '2030-06')
+        self.assertEqual(data['days'], 30)
+        self.assertEqual(data['transports'], [[self.first.pk, 1], [self.second.pk, 2]])
+        # Отрезки обрезаны по границам месяца, день окончания брони входит в отрезок
+        self.assertEqual(data['runs'], {
+            str(self.first.pk): [[5, 10, 'r'], [28, 30, 'a']],
+            str(self.second.pk): [[1, 2, 'a']],
+        })
+
+    def test_calendar_occupancy_uses_manager_city(self):
+        self.client.force_login(self.manager)
+        data = self.client.get(reverse('rentals:admin_calendar_occupancy'), {'month': '2030-06', 'city': 'sochi'}).json()
+
+        self.assertEqual(data['transports'], [[self.third.pk, 3]])
+        self.assertEqual(data['runs'], {str(self.third.pk): [[10, 12, 'r']]})
+
+
+class FleetOccupancyTests(KnownBookingsMixin, TestCase):
+    """Отрезки занятости парка за месяц для известных броней"""
+
+    def test_runs_for_known_bookings(self):
+        data = availability.fleet_occupancy(2030, 6)
+
+        self.assertEqual(data['transports'], [[self.first.pk, 1], [self.second.pk, 2], [self.third.pk, 3]])
+        self.assertEqual(data['runs'], {
+            self.first.pk: [[5, 10, 'r'], [28, 30, 'a']],
+            self.second.pk: [[1, 2, 'a']],
+            self.third.pk: [[10, 12, 'r']],
+        })
+
+    def test_runs_outside_the_month_and_overdue_code(self):
+        RentalApplication.objects.filter(transport=self.first, rental_start_date=date(2030, 6, 28)).update(
+            status=RentalApplication.STATUS_OVERDUE
+        )
+
+        self.assertEqual(availability.fleet_occupancy(2030, 7, city='sochi')['runs'], {self.first.pk: [[1, 3, 'o']]})
+        self.assertEqual(availability.fleet_occupancy(2030, 5, city='sochi')['runs'], {self.second.pk: [[30, 31, 'a']]})
+        self.assertEqual(availability.fleet_occupancy(2030, 8, city='sochi')['runs'], {})
+
+
+class FreeWindowsTests(KnownBookingsMixin, TestCase):
+    """Поиск свободных окон: город менеджера и рабочая дата по Москве"""
+
+    def windows(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get(reverse('rentals:get_free_windows'), params).json()
+
+    def test_manager_gets_own_city(self):
+        data = self.windows(self.manager, duration=2, start_date='2030-06-09', horizon=10, city='sochi')
+
+        self.assertEqual(
+            [(window['id'], window['start'], window['end']) for window in data['windows']],
+            [(self.third.pk, '2030-06-13', '2030-06-15')],
+        )
+
+    def test_superuser_may_choose_city(self):
+        data = self.windows(self.superuser, duration=2, start_date='2030-06-09', horizon=10, city='sochi')
+
+        self.assertEqual(
+            [(window['id'], window['start']) for window in data['windows']],
+            [(self.second.pk, '2030-06-09'), (self.first.pk, '2030-06-11')],
+        )
+
+    def test_horizon_starts_on_business_date(self):
+        with mock.patch('rentals.views.business_date', return_value=date(2030, 6, 9)):
+            data = self.windows(self.manager, duration=2, horizon=10)
+
+        self.assertEqual(data['windows'][0]['start'], '2030-06-13')
+
+    def test_calendar_occupancy_defaults_to_business_month(self):
+        self.client.force_login(self.manager)
+        with mock.patch('rentals.admin.business_date', return_value=date(2030, 6, 30)):
+            data = self.client.get(reverse('rentals:admin_calendar_occupancy')).json()
+
+        self.assertEqual(data['month'], '2030-06')
+
+
+class CalendarFeedETagTests(KnownBookingsMixin, TestCase):
+    """Условный GET лент календаря: совпавший ETag дает 304, изменения броней и событий меняют ETag"""
+
+    feeds = ('rentals:admin_calendar_events', 'rentals:admin_calendar_return_events')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.superuser)
+
+    def get(self, feed, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(feed), {'start': '2030-06-01', 'end': '2030-07-01'}, **headers)
+
+    def etags(self):
+        etags = {}
+        for feed in self.feeds:
+            response = self.get(feed)
+            self.assertEqual(response.status_code, 200)
+            etags[feed] = response['ETag']
+        return etags
+
+    def test_matching_etag_returns_not_modified(self):
+        for feed, etag in self.etags().items():
+            with self.subTest(feed=feed):
+                response = self.get(feed, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(self.get(feed, '"stale"').status_code, 200)
+
+    def test_rental_save_changes_etag(self):
+        etags = self.etags()
+        rental = RentalApplication.objects.get(transport=self.first, status=RentalApplication.STATUS_RESERVED)
+        # Залог не влияет на занятость и версию города, но меняет updated_at заявки
+        rental.security_deposit = 5000
+        rental.save()
+
+        for feed, etag in etags.items():
+            with self.subTest(feed=feed):
+                self.assertEqual(self.get(feed, etag).status_code, 200)
+
+    def test_calendar_event_change_changes_etag(self):
+        start = timezone.make_aware(datetime(2030, 6, 20, 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Calendar.objects.create(
+                transport=self.first, title='ТО', start=start, end=start + timedelta(hours=2), city='sochi',
+            )
+        etags = self.etags()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.title = 'Ремонт'
+            event.save()
+
+        for feed, etag in etags.items():
+            with self.subTest(feed=feed):
+                self.assertEqual(self.get(feed, etag).status_code, 200)
+
+
+class AvailabilityCacheTests(TestCase):
+    """Зафиксированное изменение брони увеличивает версию города и сбрасывает кэш доступности"""
+
+    def setUp(self):
+        cache.clear()
+        self.transport = Transport.objects.create(name='Транспорт', model='-', year=2020, number=1, city='sochi')
+
+    def options(self):
+        return availability_cache.cached_available_transport_options(date(2030, 6, 1), date(2030, 6, 3), city='sochi')
+
+    def test_committed_booking_invalidates_cached_options(self):
+        self.assertEqual([option['id'] for option in self.options()], [self.transport.pk])
+        # Повторный запрос — из кэша: читается только версия города
+        with self.assertNumQueries(1):
+            self.assertEqual([option['id'] for option in self.options()], [self.transport.pk])
+        self.assertEqual(availability_cache.stats()['hits'], 1)
+
+        version = availability_cache.get_version('sochi')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            RentalApplication.objects.create(
+                full_name='Клиент',
+                phone_number='+79990000010',
+                rental_start_date=date(2030, 6, 2),
+                rental_end_date=date(2030, 6, 4),
+                transport=self.transport,
+                city='sochi',
+            )
+            # До фиксации транзакции версия не меняется
+            self.assertEqual(availability_cache.get_version('sochi'), version)
+        self.assertTrue(callbacks)
+        self.assertGreater(availability_cache.get_version('sochi'), version)
+
+        misses = availability_cache.stats()['misses']
+        self.assertEqual(self.options(), [])
+        self.assertEqual(availability_cache.stats()['misses'], misses + 1)
+
+
+class PricingParityTests(TestCase):
+    """Стоимость, посчитанная в SQL (with_pricing), совпадает с расчетом методов заявки"""
+
+    # Границы тарифов: 2/3, 6/7 и 29/30 суток
+    boundary_days = (2, 3, 6, 7, 29, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bookings = []
+        for index, days in enumerate(cls.boundary_days):
+            transport = Transport.objects.create(
+                name=f'Транспорт {index}', model='-', year=2020,
+                price_per_day=1333, price_3_6_days=1177, price_7_30_days=999, price_30_plus_days=871,
+            )
+            # Тариф начинает действовать после начала первой брони и применяется только ко второй
+            TransportTariff.objects.create(
+                transport=transport, valid_from=date(2030, 7, 1),
+                price_per_day=2111, price_3_6_days=1999, price_7_30_days=1555, price_30_plus_days=1333,
+            )
+            for start in (date(2030, 6, 1), date(2030, 8, 1)):
+                cls.bookings.append(RentalApplication.objects.create(
+                    full_name='Клиент',
+                    phone_number='+79990000011',
+                    rental_start_date=start,
+                    rental_end_date=start + timedelta(days=days),
+                    transport=transport,
+                    discount=20,
+                ).pk)
+
+    def test_sql_pricing_matches_python(self):
+        rows = RentalApplication.objects.filter(pk__in=self.bookings).with_pricing().select_related('transport')
+        self.assertEqual(len(rows), len(self.boundary_days) * 2)
+        for application in rows:
+            with self.subTest(days=application.get_rental_days(), start=application.rental_start_date):
+                # Методы заявки без сохраненного снимка считают стоимость в Python по тарифу на дату начала
+                application.total_cost = None
+                self.assertEqual(application.live_rental_days, application.get_rental_days())
+                self.assertEqual(application.live_rate_tier, pricing.rate_tier_for_days(application.get_rental_days()))
+                self.assertEqual(application.live_daily_rate, application.get_daily_rate())
+                self.assertEqual(application.live_discount_amount, application.get_discount_amount())
+                self.assertEqual(application.live_total_cost, application.calculate_total_cost())
+
+    def test_tariff_applies_from_its_date(self):
+        rates = dict(
+            RentalApplication.objects.filter(pk__in=self.bookings, rental_days=7).with_pricing().values_list('rental_start_date', 'live_daily_rate')
+        )
+        self.assertEqual(rates, {date(2030, 6, 1): 999, date(2030, 8, 1): 1555})
+
+
+class OverdueStatusTests(TestCase):
+    """Продленная просроченная аренда снова становится активной"""
+
+    def setUp(self):
+        today = business_date()
+        self.transport = Transport.objects.create(name='Транспорт', model='-', year=2020)
+        self.rental = RentalApplication.objects.create(
+            full_name='Клиент',
+            phone_number='+79990000012',
+            rental_start_date=today - timedelta(days=5),
+            rental_end_date=today - timedelta(days=1),
+            transport=self.transport,
+            status=RentalApplication.STATUS_OVERDUE,
+        )
+
+    def test_overdue_rental_can_be_set_back_to_active(self):
+        self.assertTrue(self.rental.can_change_status_to(RentalApplication.STATUS_ACTIVE))
+        self.assertTrue(self.rental.can_change_status_to(RentalApplication.STATUS_COMPLETED))
+        self.assertFalse(self.rental.can_change_status_to(RentalApplication.STATUS_CANCELLED))
+
+        self.assertTrue(self.rental.change_status(RentalApplication.STATUS_ACTIVE))
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, RentalApplication.STATUS_ACTIVE)
+
+    def test_extending_end_date_clears_stored_overdue(self):
+        self.rental.rental_end_date = business_date()
+        self.rental.save()
+
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, RentalApplication.STATUS_ACTIVE)
+        self.assertFalse(self.rental.is_overdue)
+        self.assertEqual(
+            set(self.rental.occupied_days.values_list('status', flat=True)), {RentalApplication.STATUS_ACTIVE}
+        )
+
+    def test_extending_end_date_with_update_fields(self):
+        self.rental.rental_end_date = business_date() + timedelta(days=3)
+        self.rental.save(update_fields=['rental_end_date'])
+
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, RentalApplication.STATUS_ACTIVE)
+
+    def test_rental_ending_in_the_past_stays_overdue(self):
+        self.rental.security_deposit = 5000
+        self.rental.save()
+
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, RentalApplication.STATUS_OVERDUE)
+        self.assertTrue(self.rental.is_overdue)
+
+
+class UpdateRentalStatusesTests(TestCase):
+    """Плановое обслуживание статусов: просрочка активных аренд и отмена невыкупленных резервов"""
+
+    logger_name = 'rentals.management.commands.update_rental_statuses'
+
+    def setUp(self):
+        today = business_date()
+        self.rentals = {}
+        for index, (name, start, end, status) in enumerate((
+            ('overdue', today - timedelta(days=5), today - timedelta(days=1), RentalApplication.STATUS_ACTIVE),
+            ('ends_today', today - timedelta(days=2), today, RentalApplication.STATUS_ACTIVE),
+            ('stale_reserve', today - timedelta(days=3), today + timedelta(days=2), RentalApplication.STATUS_RESERVED),
+            ('late_reserve', today - timedelta(days=2), today + timedelta(days=2), RentalApplication.STATUS_RESERVED),
+        )):
+            transport = Transport.objects.create(name=f'Транспорт {index}', model='-', year=2020)
+            self.rentals[name] = RentalApplication.objects.create(
+                full_name=name,
+                phone_number=f'+7999400{index:04d}',
+                rental_start_date=start,
+                rental_end_date=end,
+                transport=transport,
+                status=status,
+            ).pk
+
+    def statuses(self):
+        rows = dict(RentalApplication.objects.values_list('pk', 'status'))
+        return {name: rows[pk] for name, pk in self.rentals.items()}
+
+    def test_overdue_and_stale_reservations(self):
+        output = StringIO()
+        with self.assertLogs(self.logger_name, level='INFO') as logs:
+            call_command('update_rental_statuses', '--reservation-ttl-days', '3', stdout=output)
+
+        self.assertEqual(self.statuses(), {
+            'overdue': RentalApplication.STATUS_OVERDUE,
+            'ends_today': RentalApplication.STATUS_ACTIVE,
+            'stale_reserve': RentalApplication.STATUS_CANCELLED,
+            'late_reserve': RentalApplication.STATUS_RESERVED,
+        })
+        occupancy = dict(
+            TransportDayOccupancy.objects.filter(application_id__in=[self.rentals['overdue'], self.rentals['stale_reserve']])
+            .values_list('application_id', 'status').distinct()
+        )
+        self.assertEqual(occupancy, {
+            self.rentals['overdue']: RentalApplication.STATUS_OVERDUE,
+            self.rentals['stale_reserve']: RentalApplication.STATUS_CANCELLED,
+        })
+        # id измененных заявок попадают в журнал
+        self.assertIn(f"[{self.rentals['overdue']}]", logs.output[0])
+        self.assertIn(f"[{self.rentals['stale_reserve']}]", logs.output[1])
+        self.assertIn('Просрочено аренд: 1', output.getvalue())
+
+    def test_default_ttl_comes_from_settings(self):
+        with self.settings(RENTAL_RESERVATION_TTL_DAYS=4):
+            # Значение по умолчанию читается при создании парсера команды
+            call_command('update_rental_statuses', stdout=StringIO())
+
+        self.assertEqual(self.statuses()['stale_reserve'], RentalApplication.STATUS_RESERVED)
+
+    def test_dry_run_changes_nothing(self):
+        output = StringIO()
+        call_command('update_rental_statuses', '--dry-run', '--reservation-ttl-days', '3', stdout=output)
+
+        self.assertEqual(self.statuses(), {
+            'overdue': RentalApplication.STATUS_ACTIVE,
+            'ends_today': RentalApplication.STATUS_ACTIVE,
+            'stale_reserve': RentalApplication.STATUS_RESERVED,
+            'late_reserve': RentalApplication.STATUS_RESERVED,
+        })
+        self.assertIn(f"Будут просрочены: [{self.rentals['overdue']}]", output.getvalue())
+        self.assertIn(f"отменены резервы: [{self.rentals['stale_reserve']}]", output.getvalue())
+
+
+class DirtyTrackingTests(TestCase):
+    """Заявка помнит значения из базы и пропускает шаги сохранения для неизмененных полей"""
+
+    def setUp(self):
+        self.transport = Transport.objects.create(name='Транспорт', model='-', year=2020)
+        RentalApplication.objects.create(
+            full_name='Клиент',
+            phone_number='+79990000013',
+            rental_start_date=date(2030, 6, 1),
+            rental_end_date=date(2030, 6, 3),
+            transport=self.transport,
+        )
+        self.rental = RentalApplication.objects.get()
+
+    def test_loaded_rental_has_no_changes(self):
+        self.assertEqual(self.rental.get_changed_fields(), set())
+        self.rental.security_deposit = 5000
+        self.assertEqual(self.rental.get_changed_fields(), {'security_deposit'})
+
+    def test_refresh_from_db_after_external_update(self):
+        RentalApplication.objects.filter(pk=self.rental.pk).update(status=RentalApplication.STATUS_ACTIVE)
+        self.rental.refresh_from_db()
+
+        self.assertEqual(self.rental.status, RentalApplication.STATUS_ACTIVE)
+        self.assertEqual(self.rental.get_changed_fields(), set())
+        with mock.patch.object(Transport, 'check_availability') as check, \
+                mock.patch.object(RentalApplication, '_sync_client') as sync_client:
+            self.rental.security_deposit = 5000
+            self.rental.save()
+        check.assert_not_called()
+        sync_client.assert_not_called()
+
+    def test_partial_refresh_keeps_other_changes(self):
+        RentalApplication.objects.filter(pk=self.rental.pk).update(status=RentalApplication.STATUS_ACTIVE)
+        self.rental.full_name = 'Новое имя'
+        self.rental.refresh_from_db(fields=['status'])
+
+        self.assertEqual(self.rental.get_changed_fields(), {'full_name'})
+
+    def test_date_change_runs_availability_check(self):
+        self.rental.rental_end_date = date(2030, 6, 5)
+        with mock.patch.object(Transport, 'check_availability', return_value=(True, '')) as check:
+            self.rental.save()
+        check.assert_called_once_with(date(2030, 6, 1), date(2030, 6, 5), exclude_booking_id=self.rental.pk)
+        self.assertEqual(self.rental.get_changed_fields(), set())
+
+
+class KeysetPaginationTests(TestCase):
+    """Постраничный вывод по ключу: следующая и предыдущая страницы, одинаковые значения ключа, испорченный курсор"""
+
+    per_page = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        transport = Transport.objects.create(name='Транспорт', model='-', year=2020)
+        # По три события с одинаковым началом: порядок внутри группы задает id
+        cls.events = []
+        for index in range(8):
+            start = timezone.make_aware(datetime(2030, 6, 1 + index // 3, 10))
+            cls.events.append(Calendar.objects.create(
+                transport=transport, title=f'Событие {index}', start=start, end=start + timedelta(hours=1),
+            ).pk)
+
+        rentals = []
+        for index in range(7):
+            start = date(2030, 1, 1) + timedelta(days=index * 10)
+            rentals.append(RentalApplication.objects.create(
+                full_name=f'Клиент {index}',
+                phone_number=f'+7999500{index:04d}',
+                rental_start_date=start,
+                rental_end_date=start + timedelta(days=2),
+                transport=transport,
+            ).pk)
+        # Заявки с одинаковым created_at: порядок (-created_at, -id) различает их по id
+        created_at = timezone.make_aware(datetime(2030, 1, 1, 12))
+        RentalApplication.objects.filter(pk__in=rentals[2:6]).update(created_at=created_at)
+        RentalApplication.objects.filter(pk__in=rentals[:2]).update(created_at=created_at - timedelta(days=1))
+        RentalApplication.objects.filter(pk__in=rentals[6:]).update(created_at=created_at + timedelta(days=1))
+        # Ожидаемый порядок: новые первыми, при равном created_at — больший id первым
+        cls.rentals = [rentals[6], *reversed(rentals[2:6]), *reversed(rentals[:2])]
+
+    def changelist(self, model, url='', **params):
+        model_admin = admin.site._registry[model]
+        admin_class = type('PageAdmin', (model_admin.__class__,), {'list_per_page': self.per_page})
+        page_admin = admin_class(model, model_admin.admin_site)
+        request = RequestFactory().get(url or '/', params)
+        request.user = self.user
+        response = page_admin.changelist_view(request)
+        if response.status_code == 200:
+            return response, response.context_data['cl']
+        return response, None
+
+    def page_ids(self, cl):
+        return [row.pk for row in cl.result_list]
+
+    def walk_forward(self, model):
+        pages = []
+        _, cl = self.changelist(model)
+        pages.append((self.page_ids(cl), cl))
+        while cl.next_page_url:
+            _, cl = self.changelist(model, cl.next_page_url)
+            pages.append((self.page_ids(cl), cl))
+        return pages
+
+    def test_next_pages_with_ties(self):
+        for model, expected in ((Calendar, self.events), (RentalApplication, self.rentals)):
+            with self.subTest(model=model.__name__):
+                pages = self.walk_forward(model)
+                self.assertEqual([ids for ids, _ in pages], [
+                    expected[index:index + self.per_page] for index in range(0, len(expected), self.per_page)
+                ])
+                first, last = pages[0][1], pages[-1][1]
+                self.assertIsNone(first.previous_page_url)
+                self.assertIsNone(first.first_page_url)
+                self.assertIsNone(last.next_page_url)
+
+    def test_previous_pages_with_ties(self):
+        for model, expected in ((Calendar, self.events), (RentalApplication, self.rentals)):
+            with self.subTest(model=model.__name__):
+                pages = self.walk_forward(model)
+                cl = pages[-1][1]
+                visited = [self.page_ids(cl)]
+                while cl.previous_page_url:
+                    _, cl = self.changelist(model, cl.previous_page_url)
+                    visited.append(self.page_ids(cl))
+                self.assertEqual(list(reversed(visited)), [ids for ids, _ in pages])
+                self.assertIsNone(cl.first_page_url)
+
+    def test_previous_page_near_start_shows_full_first_page(self):
+        # Переход назад со второй строки: перед ней одна строка, показываем первую страницу целиком
+        before = encode_cursor([Calendar.objects.get(pk=self.events[1]).start, self.events[1]])
+        _, cl = self.changelist(Calendar, before=before)
+
+        self.assertEqual(self.page_ids(cl), self.events[:self.per_page])
+        self.assertIsNone(cl.previous_page_url)
+        self.assertIsNotNone(cl.next_page_url)
+
+    def test_bad_cursor_redirects(self):
+        for cursor in ('not-a-cursor', encode_cursor(['2030-06-01'])):
+            with self.subTest(cursor=cursor):
+                response, _ = self.changelist(Calendar, cursor=cursor)
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(response['Location'], '/?e=1')
@@ -1,15 +1,22 @@
 from django.urls import path
 from . import views
-from .admin import CalendarAdmin, return_calendar_view, return_calendar_events
+from .admin import (
+    CalendarAdmin, return_calendar_view, return_calendar_events, calendar_occupancy, availability_cache_stats,
+)
 
 
 app_name = 'rentals'
 
 urlpatterns = [
     path('get-available-transport/', views.get_available_transport, name='get_available_transport'),
+    path('get-availability-matrix/', views.get_availability_matrix, name='get_availability_matrix'),
+    path('get-free-windows/', views.get_free_windows, name='get_free_windows'),
+    path('get-price-quote/', views.get_price_quote, name='get_price_quote'),
     path('get-client-info/', views.get_client_info, name='get_client_info'),
     path('admin/calendar/', CalendarAdmin.calendar_view, name='admin_calendar'),
     path('admin/calendar/events/', CalendarAdmin.calendar_events, name='admin_calendar_events'),
+    path('admin/calendar/occupancy/', calendar_occupancy, name='admin_calendar_occupancy'),
     path('admin/calendar/returns/', return_calendar_view, name='admin_calendar_returns'),
     path('admin/calendar/returns/events/', return_calendar_events, name='admin_calendar_return_events'),
+    path('admin/availability/cache-stats/', availability_cache_stats, name='admin_availability_cache_stats'),
 ] 
\ No newline at end of file
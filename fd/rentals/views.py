@@ -1,17 +1,64 @@
 from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import condition, require_GET
 from django.views.decorators.csrf import csrf_exempt
-from .models import Transport, RentalApplication, Client
-from django.db.models import Q
+from .models import Client, RentalApplication, business_date
+from .availability import availability_matrix, find_free_windows
+from .availability_cache import cached_available_transport_options, get_version
+from .pricing import quote_category, quote_transport
 from datetime import datetime
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Максимальное число периодов в одном запросе матрицы доступности
+MAX_MATRIX_RANGES = 10
+
+# Максимальный размер страницы списка свободного транспорта
+MAX_TRANSPORT_PAGE_SIZE = 500
+
+# Ограничения поиска свободных окон
+DEFAULT_WINDOW_HORIZON_DAYS = 60
+MAX_WINDOW_HORIZON_DAYS = 365
+MAX_WINDOW_RESULTS = 100
+
+
+def _parse_date(value):
+    """Разбирает дату в формате ДД.ММ.ГГГГ или ГГГГ-ММ-ДД, иначе None"""
+    for date_format in ['%d.%m.%Y', '%Y-%m-%d']:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def _request_city(request):
+    """Город менеджера из профиля; суперпользователь и внешние запросы могут передать city"""
+    if request.user.is_authenticated and not request.user.is_superuser:
+        profile = getattr(request.user, 'profile', None)
+        if profile:
+            return profile.city
+    return request.GET.get('city') or None
+
+def _available_transport_etag(request):
+    """ETag списка свободного транспорта: версия занятости города и параметры запроса"""
+    city = _request_city(request)
+    # Версия нужна и самому view для ключа кэша — запоминаем, чтобы не читать ее второй раз
+    request.availability_version = get_version(city)
+    params = '&'.join(f"{name}={value}" for name, values in sorted(request.GET.lists()) for value in values)
+    return hashlib.md5(f"{city or '*'}:{request.availability_version}:{params}".encode()).hexdigest()
+
 @require_GET
 @csrf_exempt
+@condition(etag_func=_available_transport_etag)
 def get_available_transport(request):
-    """View для получения списка доступного транспорта на выбранные даты"""
+    """
+    View для получения списка доступного транспорта на выбранные даты.
+
+    Необязательные параметры: city, category, transmission, q (поиск),
+    page и limit (без limit возвращается весь список), priced=1 — добавить
+    стоимость аренды за период и отсортировать по ней.
+    """
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     
@@ -42,36 +89,42 @@ def get_available_transport(request):
                 'message': 'Неверный формат даты'
             })
         
-        # Получаем ID занятого транспорта, исключая отмененные и завершенные заявки
-        booked_transport_ids = RentalApplication.objects.filter(
-            Q(rental_start_date__lte=end_date) & 
-            Q(rental_end_date__gte=start_date) &
-            ~Q(status__in=[RentalApplication.STATUS_CANCELLED, RentalApplication.STATUS_COMPLETED])  # Исключаем отмененные и завершенные заявки
-        ).values_list('transport_id', flat=True)
-        
-        logger.info(f"Booked transport IDs: {list(booked_transport_ids)}")
-        
-        # Получаем доступный транспорт
-        available_transport = Transport.objects.exclude(
-            id__in=booked_transport_ids
+        try:
+            page = max(1, int(request.GET.get('page') or 1))
+            limit = request.GET.get('limit')
+            limit = max(1, min(int(limit), MAX_TRANSPORT_PAGE_SIZE)) if limit else None
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'page и limit должны быть целыми числами'
+            })
+
+        # Свободный транспорт из кэша (или одним запросом), только поля для выпадающего списка.
+        # Берем на одну строку больше страницы, чтобы узнать, есть ли следующая, без COUNT
+        exclude_booking_id = request.GET.get('exclude_booking_id')
+        transport_options = cached_available_transport_options(
+            start_date, end_date,
+            city=_request_city(request),
+            exclude_booking_id=int(exclude_booking_id) if exclude_booking_id and exclude_booking_id.isdigit() else None,
+            version=getattr(request, 'availability_version', None),
+            category=request.GET.get('category') or None,
+            transmission=request.GET.get('transmission') or None,
+            q=(request.GET.get('q') or '').strip() or None,
+            offset=(page - 1) * limit if limit else 0,
+            limit=limit + 1 if limit else None,
+            priced=request.GET.get('priced') == '1',
         )
+        has_more = bool(limit) and len(transport_options) > limit
+        if has_more:
+            transport_options = transport_options[:limit]
         
-        logger.info(f"Available transport count: {available_transport.count()}")
-        
-        # Формируем список для выпадающего списка
-        transport_options = [
-            {
-                'id': t.id,
-                'text': f"№{t.number} {t.name} {t.model} ({t.vin_number})"
-            }
-            for t in available_transport
-        ]
-        
-        logger.info(f"Returning options: {transport_options}")
+        logger.info(f"Available transport count: {len(transport_options)}")
         
         return JsonResponse({
             'status': 'success',
-            'options': transport_options
+            'options': transport_options,
+            'page': page,
+            'has_more': has_more,
         })
         
     except Exception as e:
@@ -81,6 +134,203 @@ def get_available_transport(request):
             'message': str(e)
         }) 
 
+@require_GET
+@csrf_exempt
+def get_availability_matrix(request):
+    """
+    View для проверки нескольких периодов аренды за один запрос.
+
+    Принимает повторяющиеся пары start_date/end_date и необязательные city и category,
+    возвращает матрицу доступности «транспорт × период».
+    """
+    start_dates = request.GET.getlist('start_date')
+    end_dates = request.GET.getlist('end_date')
+
+    if not start_dates or len(start_dates) != len(end_dates):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Укажите даты аренды'
+        })
+    if len(start_dates) > MAX_MATRIX_RANGES:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Можно проверить не более {MAX_MATRIX_RANGES} периодов за раз'
+        })
+
+    ranges = []
+    for raw_start, raw_end in zip(start_dates, end_dates):
+        start_date = _parse_date(raw_start)
+        end_date = _parse_date(raw_end)
+        if not (start_date and end_date):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Неверный формат даты'
+            })
+        if start_date > end_date:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Дата окончания аренды не может быть раньше даты начала'
+            })
+        ranges.append((start_date, end_date))
+
+    try:
+        result = availability_matrix(
+            ranges,
+            city=_request_city(request),
+            category=request.GET.get('category') or None,
+        )
+        return JsonResponse({
+            'status': 'success',
+            'ranges': [[start.isoformat(), end.isoformat()] for start, end in ranges],
+            'transports': result['transports'],
+            'matrix': result['matrix'],
+        })
+    except Exception as e:
+        logger.error(f"Error in get_availability_matrix: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        })
+
+def parse_free_window_params(params, city=None):
+    """
+    Разбирает параметры поиска свободных окон из GET-запроса.
+
+    Город передается отдельно: его определяет вызывающий по пользователю (см. _request_city),
+    а не параметр city запроса.
+
+    Returns:
+        dict: аргументы для availability.find_free_windows
+
+    Raises:
+        ValueError: с сообщением для пользователя, если параметры некорректны
+    """
+    try:
+        duration_days = int(params.get('duration', ''))
+        horizon_days = int(params.get('horizon') or DEFAULT_WINDOW_HORIZON_DAYS)
+        limit = int(params.get('limit') or 20)
+    except ValueError:
+        raise ValueError('Длительность, горизонт и лимит должны быть целыми числами')
+    if duration_days < 1:
+        raise ValueError('Укажите длительность аренды в сутках')
+    if not 1 <= horizon_days <= MAX_WINDOW_HORIZON_DAYS:
+        raise ValueError(f'Горизонт поиска — от 1 до {MAX_WINDOW_HORIZON_DAYS} дней')
+
+    horizon_start = business_date()
+    if params.get('start_date'):
+        horizon_start = _parse_date(params['start_date'])
+        if not horizon_start:
+            raise ValueError('Неверный формат даты')
+
+    return {
+        'duration_days': duration_days,
+        'horizon_start': horizon_start,
+        'horizon_days': horizon_days,
+        'city': city,
+        'category': params.get('category') or None,
+        'transmission': params.get('transmission') or None,
+        'limit': max(1, min(limit, MAX_WINDOW_RESULTS)),
+    }
+
+@require_GET
+@csrf_exempt
+def get_free_windows(request):
+    """View для поиска ближайших свободных окон заданной длительности"""
+    try:
+        search = parse_free_window_params(request.GET, city=_request_city(request))
+    except ValueError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        })
+
+    try:
+        windows = find_free_windows(**search)
+        return JsonResponse({
+            'status': 'success',
+            'windows': [
+                {
+                    'id': window['id'],
+                    'text': window['text'],
+                    'start': window['start'].isoformat(),
+                    'end': window['end'].isoformat(),
+                }
+                for window in windows
+            ]
+        })
+    except Exception as e:
+        logger.error(f"Error in get_free_windows: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        })
+
+@require_GET
+@csrf_exempt
+def get_price_quote(request):
+    """
+    View для расчета стоимости аренды на сайте.
+
+    Принимает transport_id или category (и необязательный city), даты и скидку;
+    для категории считает стоимость самого дешевого транспорта. Цены берутся из
+    таблицы тарифов в памяти процесса, поэтому обычно из базы читается только версия цен.
+    Скидку назначает менеджер, поэтому для посетителей сайта она не учитывается.
+    """
+    start_date = _parse_date(request.GET.get('start_date'))
+    end_date = _parse_date(request.GET.get('end_date'))
+    if not (start_date and end_date):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Укажите даты аренды'
+        })
+    days = (end_date - start_date).days
+    if days < 1:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Дата окончания аренды должна быть позже даты начала'
+        })
+
+    discount = 0
+    if request.user.is_staff:
+        try:
+            discount = int(request.GET.get('discount') or 0)
+        except ValueError:
+            discount = None
+    if discount not in dict(RentalApplication.DISCOUNT_CHOICES):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Недопустимая скидка'
+        })
+
+    transport_id = request.GET.get('transport_id')
+    category = request.GET.get('category')
+    if transport_id:
+        try:
+            result = quote_transport(int(transport_id), days, discount, start_date=start_date)
+        except ValueError:
+            result = None
+    elif category:
+        result = quote_category(
+            category, days, discount, city=request.GET.get('city') or None, start_date=start_date
+        )
+    else:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Укажите транспорт или категорию'
+        })
+
+    if result is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Транспорт не найден'
+        })
+    return JsonResponse({
+        'status': 'success',
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'quote': result,
+    })
+
 @require_GET
 @csrf_exempt
 def get_client_info(request):